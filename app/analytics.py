@@ -0,0 +1,27 @@
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from sklearn.ensemble import IsolationForest
+
+##############################
+# ML
+##############################
+def predict_future_price(prices):
+    if len(prices) < 2: return None
+    X = np.arange(len(prices)).reshape(-1, 1)
+    y = np.array(prices).reshape(-1, 1)
+    model = LinearRegression()
+    model.fit(X, y)
+    return model.predict([[len(prices)]])[0][0]
+
+def detect_anomalies(prices, contamination=0.1):
+    if len(prices) < 2: return []
+    model = IsolationForest(contamination=contamination)
+    preds = model.fit_predict(np.array(prices).reshape(-1, 1))
+    return [i for i, p in enumerate(preds) if p == -1]
+
+def anomaly_scores(prices):
+    # IsolationForest scores (lower = more anomalous). detect_anomalies() flags the points scoring
+    # below the `contamination` percentile, so one fit can be thresholded at any contamination.
+    model = IsolationForest()
+    X = np.array(prices).reshape(-1, 1)
+    return model.fit(X).score_samples(X)
@@ -0,0 +1,138 @@
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+USERS_DB = "users.db"
+
+# scrypt cost parameters; N must be a power of two. Memory use is roughly 128 * N * r bytes.
+SCRYPT_N = int(os.environ.get("SCRYPT_N", 2 ** 14))
+SCRYPT_R = int(os.environ.get("SCRYPT_R", 8))
+SCRYPT_P = int(os.environ.get("SCRYPT_P", 1))
+SALT_BYTES = 16
+
+# How long a login stays valid without touching the database
+SESSION_TTL_SECONDS = int(os.environ.get("SESSION_TTL_SECONDS", 8 * 3600))
+
+_lock = threading.Lock()
+_connections = {}
+_sessions = {}
+
+
+##############################
+# DATABASE
+##############################
+def get_connection(db_path=USERS_DB):
+    # One shared connection per database file instead of a new (leaked) one per login
+    with _lock:
+        conn = _connections.get(db_path)
+        if conn is None:
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            conn.execute('''CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL)''')
+            conn.commit()
+            _connections[db_path] = conn
+        return conn
+
+
+def close_connections():
+    with _lock:
+        for conn in _connections.values():
+            conn.close()
+        _connections.clear()
+
+
+##############################
+# PASSWORD HASHING
+##############################
+def hash_password(password, n=None, r=None, p=None):
+    # Salted scrypt hash stored as "scrypt$n$r$p$salt$hash"
+    n, r, p = n or SCRYPT_N, r or SCRYPT_R, p or SCRYPT_P
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r)
+    return f"scrypt${n}${r}${p}${salt.hex()}${digest.hex()}"
+
+
+def verify_password(password, stored):
+    # Returns (matches, needs_rehash). Unsalted SHA-256 hashes from before scrypt still verify
+    # but are flagged for upgrade, as are hashes made with older cost parameters.
+    if stored.startswith("scrypt$"):
+        try:
+            _, n, r, p, salt, expected = stored.split("$")
+            n, r, p = int(n), int(r), int(p)
+            digest = hashlib.scrypt(password.encode(), salt=bytes.fromhex(salt), n=n, r=r, p=p,
+                                    maxmem=256 * n * r)
+        except ValueError:
+            return False, False
+        matches = hmac.compare_digest(digest.hex(), expected)
+        return matches, matches and (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    legacy = hashlib.sha256(password.encode()).hexdigest()
+    matches = hmac.compare_digest(legacy, stored)
+    return matches, matches
+
+
+##############################
+# USERS
+##############################
+def register_user(name, email, password, db_path=USERS_DB):
+    conn = get_connection(db_path)
+    hashed = hash_password(password)
+    try:
+        with _lock:
+            conn.execute("INSERT INTO users (name, email, password) VALUES (?, ?, ?)", (name, email, hashed))
+            conn.commit()
+        return "✅ Registration Successful!"
+    except sqlite3.IntegrityError:
+        return "⚠️ Email already exists!"
+
+
+def login_user(email, password, db_path=USERS_DB):
+    conn = get_connection(db_path)
+    with _lock:
+        user = conn.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+    if not user:
+        return None
+    matches, needs_rehash = verify_password(password, user[3])
+    if not matches:
+        return None
+    if needs_rehash:
+        with _lock:
+            conn.execute("UPDATE users SET password = ? WHERE id = ?", (hash_password(password), user[0]))
+            conn.commit()
+    return user
+
+
+##############################
+# SESSIONS
+##############################
+def create_session(email, ttl=SESSION_TTL_SECONDS):
+    token = secrets.token_urlsafe(32)
+    with _lock:
+        _sessions[token] = (email, time.time() + ttl)
+    return token
+
+
+def get_session(token):
+    # Email for a live session token, or None; expired tokens are dropped
+    if not token:
+        return None
+    with _lock:
+        session = _sessions.get(token)
+        if session is None:
+            return None
+        email, expires = session
+        if expires < time.time():
+            del _sessions[token]
+            return None
+        return email
+
+
+def end_session(token):
+    with _lock:
+        _sessions.pop(token, None)
@@ -0,0 +1,50 @@
+import argparse
+import os
+import tempfile
+import time
+
+import auth
+
+# Microbenchmark for login throughput at chosen scrypt cost parameters:
+#   python bench_auth.py --n 16384 --r 8 --p 1 --logins 50
+
+
+def bench_logins(n, r, p, logins, sessions):
+    auth.SCRYPT_N, auth.SCRYPT_R, auth.SCRYPT_P = n, r, p
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench_users.db")
+        auth.register_user("Bench User", "bench@example.com", "correct horse battery staple", db_path)
+
+        start = time.perf_counter()
+        for _ in range(logins):
+            assert auth.login_user("bench@example.com", "correct horse battery staple", db_path)
+        login_elapsed = time.perf_counter() - start
+
+        token = auth.create_session("bench@example.com")
+        start = time.perf_counter()
+        for _ in range(sessions):
+            assert auth.get_session(token)
+        session_elapsed = time.perf_counter() - start
+        auth.close_connections()
+
+    return {
+        "n": n,
+        "r": r,
+        "p": p,
+        "memory_mb": round(128 * n * r / 2 ** 20, 1),
+        "login_ms": round(login_elapsed / logins * 1000, 2),
+        "logins_per_second": round(logins / login_elapsed, 1),
+        "session_checks_per_second": round(sessions / session_elapsed),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Login throughput at chosen scrypt cost parameters")
+    parser.add_argument("--n", type=int, nargs="+", default=[2 ** 12, 2 ** 14, 2 ** 15], help="scrypt N values")
+    parser.add_argument("--r", type=int, default=auth.SCRYPT_R)
+    parser.add_argument("--p", type=int, default=auth.SCRYPT_P)
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=100000)
+    args = parser.parse_args()
+    for n in args.n:
+        print(bench_logins(n, args.r, args.p, args.logins, args.sessions))
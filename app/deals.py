@@ -0,0 +1,201 @@
+import heapq
+import json
+import os
+import threading
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime, timedelta
+
+from metrics import add_route, inc, send_body, timer
+from price_history import get_prices, last_checked
+from product_store import DATA_FILE, load_tracked_products
+
+# Rolling windows maintained for every product
+WINDOWS = {
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+    "90d": timedelta(days=90),
+}
+
+# Rankings served by the engine:
+#   "drop"      - largest percent drop over the window
+#   "low"       - products at their lowest price of the window, deepest below the window average first
+#   "below_avg" - furthest below the window average
+METRICS = ("drop", "low", "below_avg")
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+##############################
+# ROLLING STATS
+##############################
+class RollingWindow:
+    # Readings inside a time window with amortised O(1) min/max/avg. The oldest reading kept is
+    # the one in effect at the window start, so percent change is measured against it.
+    def __init__(self, span):
+        self.span = span
+        self.points = deque()
+        self.mins = deque()
+        self.maxs = deque()
+        self.total = 0.0
+        self.seq = 0
+
+    def add(self, timestamp, price):
+        self.points.append((self.seq, timestamp, price))
+        self.total += price
+        while self.mins and self.mins[-1][1] >= price:
+            self.mins.pop()
+        self.mins.append((self.seq, price))
+        while self.maxs and self.maxs[-1][1] <= price:
+            self.maxs.pop()
+        self.maxs.append((self.seq, price))
+        self.seq += 1
+
+    def evict(self, now):
+        cutoff = (now - self.span).strftime(TIMESTAMP_FORMAT)
+        while len(self.points) > 1 and self.points[1][1] <= cutoff:
+            self.total -= self.points.popleft()[2]
+        first = self.points[0][0] if self.points else self.seq
+        while self.mins and self.mins[0][0] < first:
+            self.mins.popleft()
+        while self.maxs and self.maxs[0][0] < first:
+            self.maxs.popleft()
+
+    def stats(self):
+        start_price, current = self.points[0][2], self.points[-1][2]
+        avg = self.total / len(self.points)
+        return {
+            "min": self.mins[0][1],
+            "max": self.maxs[0][1],
+            "avg": round(avg, 2),
+            "start_price": start_price,
+            "change_pct": round((current - start_price) / start_price * 100, 2) if start_price else 0.0,
+            "vs_avg_pct": round((current - avg) / avg * 100, 2) if avg else 0.0,
+        }
+
+
+class ProductStats:
+    def __init__(self, url, details):
+        self.url = url
+        self.name = details.get('name')
+        self.platform = details.get('platform', 'Unknown')
+        self.windows = {label: RollingWindow(span) for label, span in WINDOWS.items()}
+        self.last_ts = None
+        self.current = None
+
+    def update(self, details):
+        # Feed only readings newer than the last one seen, and to each window only the readings
+        # inside its span. Rolled-up buckets (older than the raw retention period) contribute
+        # their high, low and close so window extremes survive the rollup.
+        self.name = details.get('name', self.name)
+        self.platform = details.get('platform', self.platform)
+        rollups = details.get('rollups', {})
+        points = []
+        for bucket, _, high, low, close in sorted(rollups.get('daily', []) + rollups.get('hourly', [])):
+            points.extend((bucket, price) for price in (high, low) if price != close)
+            points.append((bucket, close))
+        points.extend(get_prices(details))
+        points = [point for point in points if self.last_ts is None or point[0] > self.last_ts]
+        if not points:
+            return
+
+        newest = datetime.strptime(points[-1][0], TIMESTAMP_FORMAT)
+        timestamps = [timestamp for timestamp, _ in points]
+        for window in self.windows.values():
+            cutoff = (newest - window.span).strftime(TIMESTAMP_FORMAT)
+            for timestamp, price in points[max(bisect_right(timestamps, cutoff) - 1, 0):]:
+                window.add(timestamp, price)
+            window.evict(newest)
+        self.last_ts, self.current = points[-1]
+
+
+##############################
+# INDEX
+##############################
+class DealIndex:
+    # Per-product rolling stats kept in memory and updated incrementally from the store
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.products = {}
+
+    def sync(self, products):
+        # Apply new readings only; products whose last check hasn't moved are skipped in O(1)
+        updated = 0
+        with self.lock:
+            for url in set(self.products) - set(products):
+                del self.products[url]
+            for url, details in products.items():
+                entry = self.products.get(url)
+                checked = last_checked(details)
+                if entry is not None and checked is not None and entry.last_ts is not None \
+                        and checked <= entry.last_ts:
+                    continue
+                if entry is None:
+                    entry = self.products[url] = ProductStats(url, details)
+                entry.update(details)
+                updated += 1
+        inc("deal_index_updates_total", updated)
+        return updated
+
+    def rank(self, metric="drop", window="24h", k=20, now=None):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown deal metric: {metric}")
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown window: {window}")
+        now = now or datetime.now()
+        candidates = []
+        with self.lock:
+            for entry in self.products.values():
+                if entry.current is None:
+                    continue
+                rolling = entry.windows[window]
+                rolling.evict(now)
+                stats = rolling.stats()
+                if metric == "drop":
+                    score = stats["change_pct"]
+                elif metric == "low":
+                    if entry.current > stats["min"] or stats["min"] == stats["max"]:
+                        continue
+                    score = stats["vs_avg_pct"]
+                else:
+                    score = stats["vs_avg_pct"]
+                if score >= 0:
+                    continue
+                candidates.append((score, entry.url, entry, stats))
+        top = heapq.nsmallest(k, candidates, key=lambda c: (c[0], c[1]))
+        return [dict(stats, url=entry.url, name=entry.name, platform=entry.platform, price=entry.current,
+                     window=window, score=score) for score, _, entry, stats in top]
+
+
+index = DealIndex()
+_synced = {}
+
+
+def top_deals(metric="drop", window="24h", k=20, path=DATA_FILE, now=None):
+    # Rank deals across the store, re-reading the file only when it has changed since the last sync
+    with timer("top_deals", metric=metric):
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        if _synced.get(path) != mtime:
+            index.sync(load_tracked_products(path))
+            _synced[path] = mtime
+        return index.rank(metric, window, k, now)
+
+
+##############################
+# HTTP ENDPOINT
+##############################
+def _serve_deals(request, query):
+    try:
+        deals = top_deals(query.get("metric", "drop"), query.get("window", "24h"), int(query.get("k", 20)))
+    except ValueError as e:
+        request.send_error(400, str(e))
+        return
+    send_body(request, json.dumps({"deals": deals}).encode(), "application/json")
+
+
+# Served on the metrics port (METRICS_PORT) once start_metrics_server() is running
+add_route("/deals", _serve_deals)
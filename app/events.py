@@ -0,0 +1,304 @@
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from metrics import inc, start_http_server
+
+# Port for the Server-Sent Events endpoint (/events)
+EVENTS_PORT = int(os.environ.get("EVENTS_PORT", 9101))
+
+# Comma-separated webhook URLs that receive batches of price change events
+WEBHOOK_URLS = [url for url in os.environ.get("WEBHOOK_URLS", "").split(",") if url]
+
+# A batch is delivered when it reaches BATCH_SIZE events or has waited FLUSH_SECONDS
+BATCH_SIZE = int(os.environ.get("EVENT_BATCH_SIZE", 50))
+FLUSH_SECONDS = float(os.environ.get("EVENT_FLUSH_SECONDS", 5))
+
+# Events buffered per subscriber before the oldest are dropped
+SUBSCRIBER_BUFFER = 1000
+
+SSE_KEEPALIVE_SECONDS = 15
+
+# Shared SQLite event log: worker containers append price changes, and the process serving
+# /events and webhooks relays them to its subscribers
+EVENTS_DB = os.environ.get("EVENTS_DB", "events.db")
+
+# How often the relay polls the log, and how long logged events are kept
+RELAY_POLL_SECONDS = float(os.environ.get("EVENT_RELAY_POLL_SECONDS", 0.5))
+EVENT_RETENTION_SECONDS = int(os.environ.get("EVENT_RETENTION_SECONDS", 24 * 3600))
+
+
+##############################
+# STREAM
+##############################
+class EventStream:
+    # In-process pub/sub: every subscriber gets its own bounded queue of events
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_BUFFER)
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Slow consumer: drop its oldest event rather than block the writer
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+                subscriber.put_nowait(event)
+                inc("events_dropped_total")
+        inc("events_published_total", type=event["type"])
+
+
+stream = EventStream()
+
+
+def next_batch(subscriber, max_size=None, first_wait=None, linger=None):
+    # Wait up to first_wait for an event, then gather more for up to `linger` seconds or until
+    # the batch is full
+    max_size = max_size or BATCH_SIZE
+    linger = FLUSH_SECONDS if linger is None else linger
+    try:
+        batch = [subscriber.get(timeout=linger if first_wait is None else first_wait)]
+    except queue.Empty:
+        return []
+    deadline = time.time() + linger
+    while len(batch) < max_size:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(subscriber.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+
+def publish_price_change(url, details, old_price, new_price, timestamp):
+    # Emit an event for a stored price change; unchanged readings and first readings are skipped
+    if old_price is None or old_price == new_price:
+        return None
+    event = {
+        "type": "price_drop" if new_price < old_price else "price_rise",
+        "url": url,
+        "name": details.get("name"),
+        "platform": details.get("platform"),
+        "old_price": old_price,
+        "new_price": new_price,
+        "change_pct": round((new_price - old_price) / old_price * 100, 2) if old_price else None,
+        "timestamp": timestamp,
+    }
+    log_event(event)
+    return event
+
+
+##############################
+# CROSS-PROCESS LOG
+##############################
+_local = threading.local()
+_relay = None
+
+
+def _events_db(path):
+    # One connection per thread and file
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    if path not in connections:
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # AUTOINCREMENT so ids are never reused after pruning and the relay's position stays valid
+        conn.execute('''CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at REAL NOT NULL,
+            body TEXT NOT NULL)''')
+        connections[path] = conn
+    return connections[path]
+
+
+def log_event(event, path=None):
+    # Append to the shared log; a failure here must not fail the store write that produced it
+    try:
+        _events_db(path or EVENTS_DB).execute("INSERT INTO events (created_at, body) VALUES (?, ?)",
+                                              (time.time(), json.dumps(event)))
+        inc("events_logged_total", type=event["type"])
+    except sqlite3.Error as e:
+        inc("events_logged_total", type="error")
+        print("Event Log Error:", e, file=sys.stderr)
+
+
+def relay_events(conn, last_id, limit=1000):
+    # Publish logged events newer than last_id to this process's stream; returns (last_id, count)
+    rows = conn.execute("SELECT id, body FROM events WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit)).fetchall()
+    for event_id, body in rows:
+        stream.publish(json.loads(body))
+        last_id = event_id
+    return last_id, len(rows)
+
+
+def start_event_relay(path=None, poll_seconds=None):
+    # Start (once per process) a thread tailing the shared log into the in-process stream. Only
+    # events logged after it starts are relayed, like a new subscriber.
+    global _relay
+    if _relay and _relay.is_alive():
+        return _relay
+    path = path or EVENTS_DB
+    poll_seconds = RELAY_POLL_SECONDS if poll_seconds is None else poll_seconds
+    last_id = _events_db(path).execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def loop():
+        nonlocal last_id
+        conn = _events_db(path)
+        pruned_at = 0.0
+        while True:
+            count = 0
+            try:
+                last_id, count = relay_events(conn, last_id)
+                if time.time() - pruned_at > 60:
+                    conn.execute("DELETE FROM events WHERE created_at < ?", (time.time() - EVENT_RETENTION_SECONDS,))
+                    pruned_at = time.time()
+            except sqlite3.Error as e:
+                print("Event Relay Error:", e, file=sys.stderr)
+            if not count:
+                time.sleep(poll_seconds)
+
+    _relay = threading.Thread(target=loop, name="event-relay", daemon=True)
+    _relay.start()
+    return _relay
+
+
+##############################
+# WEBHOOKS
+##############################
+_dispatcher = None
+
+
+def deliver_batch(webhook_url, batch):
+    try:
+        response = requests.post(webhook_url, json={"events": batch}, timeout=10)
+        response.raise_for_status()
+        inc("webhook_deliveries_total", result="ok")
+        return True
+    except Exception as e:
+        inc("webhook_deliveries_total", result="error")
+        print(f"Webhook Delivery Error ({webhook_url}):", e, file=sys.stderr)
+        return False
+
+
+def start_webhook_dispatcher(webhook_urls=None):
+    # Start (once per process) a thread that posts batched events to every webhook. Run it in one
+    # process only (the web app): it relays the events logged by every process.
+    global _dispatcher
+    if _dispatcher and _dispatcher.is_alive():
+        return _dispatcher
+    if not (webhook_urls or WEBHOOK_URLS):
+        return None
+    subscriber = stream.subscribe()
+    start_event_relay()
+
+    def loop():
+        while True:
+            batch = next_batch(subscriber)
+            if batch:
+                for webhook_url in webhook_urls or WEBHOOK_URLS:
+                    deliver_batch(webhook_url, batch)
+
+    _dispatcher = threading.Thread(target=loop, name="webhook-dispatcher", daemon=True)
+    _dispatcher.start()
+    return _dispatcher
+
+
+##############################
+# SERVER-SENT EVENTS
+##############################
+class _EventsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/events":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        subscriber = stream.subscribe()
+        try:
+            while True:
+                batch = next_batch(subscriber, first_wait=SSE_KEEPALIVE_SECONDS)
+                if batch:
+                    message = f"event: price_changes\ndata: {json.dumps(batch)}\n\n"
+                else:
+                    message = ": keepalive\n\n"
+                self.wfile.write(message.encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            stream.unsubscribe(subscriber)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_event_server(port=EVENTS_PORT, host="0.0.0.0"):
+    # Serve /events, fed by the relay from the shared event log
+    server = start_http_server("event", _EventsHandler, port, host)
+    if server is not None:
+        start_event_relay()
+    return server
+
+
+##############################
+# LOCAL RECEIVER (tests / development)
+##############################
+class LocalWebhookReceiver:
+    # Stand-in webhook endpoint that records every batch posted to it
+    def __init__(self, host="127.0.0.1", port=0):
+        self.batches = []
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                receiver.batches.append(json.loads(self.rfile.read(length))["events"])
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
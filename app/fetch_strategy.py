@@ -0,0 +1,208 @@
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import inc, timer
+from product_store import locked_json, read_json_cached
+from retry_queue import record_failure, record_success
+from scraper import BOT_WALL, SELECTOR_MISS, ScrapeError, detect_platform, download_page, parse_product
+from structured_data import parse_price
+
+# File recording URLs that only work in a headless browser
+ESCALATION_FILE = "fetch_tiers.json"
+
+# Failure classes that mean the plain HTTP page is bot-walled or needs JavaScript to render
+ESCALATE_KINDS = {BOT_WALL, SELECTOR_MISS}
+
+# Platforms fetch_with_browser has selectors for; others stay on the HTTP path and its fallbacks
+BROWSER_PLATFORMS = {"Amazon"}
+
+# Escalated URLs go back to trying plain HTTP after this long, in case the site changed
+ESCALATION_TTL_SECONDS = int(os.environ.get("ESCALATION_TTL_SECONDS", 7 * 24 * 3600))
+
+# Headless Chrome instances kept alive and reused between fetches
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", 2))
+
+# Seconds to let the page render after load
+BROWSER_RENDER_WAIT = 3
+
+IMAGE_PATTERNS = [
+    re.compile(rb'id="landingImage"[^>]*?data-old-hires="([^"]+)"'),
+    re.compile(rb'id="landingImage"[^>]*?src="([^"]+)"'),
+    re.compile(rb'<meta[^>]+property="og:image"[^>]+content="([^"]+)"'),
+]
+
+_lock = threading.Lock()
+
+
+##############################
+# ESCALATION RECORD
+##############################
+def should_escalate(url, error):
+    return getattr(error, "kind", None) in ESCALATE_KINDS and detect_platform(url) in BROWSER_PLATFORMS
+
+
+def escalation_reason(url, now=None, path=ESCALATION_FILE):
+    # Failure class that sent `url` to the browser tier, or None while plain HTTP should be tried
+    if detect_platform(url) not in BROWSER_PLATFORMS:
+        return None
+    now = now or time.time()
+    entry = read_json_cached(path).get(url)
+    if entry is None or now - entry["since"] >= ESCALATION_TTL_SECONDS:
+        return None
+    return entry["reason"]
+
+
+def needs_browser(url, now=None, path=ESCALATION_FILE):
+    return escalation_reason(url, now, path) is not None
+
+
+def mark_needs_browser(url, reason, path=ESCALATION_FILE):
+    with locked_json(path) as escalations:
+        escalations[url] = {"reason": reason, "since": time.time()}
+
+
+def clear_escalation(url, path=ESCALATION_FILE):
+    # Back to plain HTTP first, e.g. after the browser failed as well
+    if url not in read_json_cached(path):
+        return
+    with locked_json(path) as escalations:
+        escalations.pop(url, None)
+
+
+def escalated_urls(path=ESCALATION_FILE):
+    return dict(read_json_cached(path))
+
+
+##############################
+# BROWSER POOL
+##############################
+def setup_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
+    options = Options()
+    options.add_argument("--headless")
+    if os.environ.get("CHROME_BIN"):
+        # e.g. Debian's chromium package in the Docker image
+        options.binary_location = os.environ["CHROME_BIN"]
+        options.add_argument("--no-sandbox")
+    service = Service()  # Add path to chromedriver if needed: Service("/path/to/chromedriver")
+    return webdriver.Chrome(service=service, options=options)
+
+
+class BrowserPool:
+    # Reuses a few headless browsers instead of starting and quitting Chrome for every fetch
+    def __init__(self, size=BROWSER_POOL_SIZE, factory=setup_driver):
+        self.factory = factory
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def driver(self):
+        self.slots.acquire()
+        try:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                with timer("browser_start"):
+                    driver = self.factory()
+            try:
+                yield driver
+            except Exception:
+                # A browser that failed mid-fetch may be wedged; don't hand it out again
+                driver.quit()
+                raise
+            self.idle.put(driver)
+        finally:
+            self.slots.release()
+
+    def close(self):
+        while not self.idle.empty():
+            self.idle.get_nowait().quit()
+
+
+_pool = None
+
+
+def get_browser_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = BrowserPool()
+        return _pool
+
+
+##############################
+# TIERED FETCH
+##############################
+def extract_image(content):
+    for pattern in IMAGE_PATTERNS:
+        match = pattern.search(content)
+        if match:
+            return match.group(1).decode("utf-8", errors="replace")
+    return None
+
+
+def fetch_with_http(url):
+    platform = detect_platform(url)
+    content, _ = download_page(url, platform, stream=False)
+    name, price, _ = parse_product(content, platform)
+    return {"title": name, "price": price, "link": url, "image": extract_image(content)}
+
+
+def fetch_with_browser(url):
+    from selenium.webdriver.common.by import By
+
+    with get_browser_pool().driver() as driver:
+        with timer("selenium_page_load"):
+            driver.get(url)
+        time.sleep(BROWSER_RENDER_WAIT)
+        title = driver.find_element(By.ID, 'productTitle').text
+        price_elem = driver.find_element(By.CSS_SELECTOR, '.a-price .a-offscreen')
+        price = parse_price(price_elem.get_attribute('innerHTML'))
+        image = driver.find_element(By.ID, 'landingImage').get_attribute('src')
+    if not title or price is None:
+        raise ScrapeError(SELECTOR_MISS, "Name or price not found in the rendered page", detect_platform(url))
+    return {"title": title, "price": price, "link": url, "image": image}
+
+
+def fetch_product_tiered(url):
+    # Try the cheap HTTP path first and escalate to a pooled headless browser only for pages that
+    # are bot-walled or need JavaScript. Escalated URLs skip straight to the browser next time.
+    reason = escalation_reason(url)
+    if reason is None:
+        try:
+            product = fetch_with_http(url)
+            record_success(url)
+            inc("fetch_tier_total", tier="http", result="ok")
+            return dict(product, tier="http")
+        except ScrapeError as e:
+            inc("fetch_tier_total", tier="http", result=e.kind)
+            if not should_escalate(url, e):
+                record_failure(url, e)
+                print(f"Error fetching product ({e.kind}): {str(e)}", file=sys.stderr)
+                return None
+            mark_needs_browser(url, e.kind)
+            reason = e.kind
+
+    try:
+        product = fetch_with_browser(url)
+    except Exception as e:
+        if not isinstance(e, ScrapeError):
+            # Driver errors (missing element, timeout, no Chrome) keep the class that escalated the URL
+            e = ScrapeError(reason, f"Browser fetch failed: {e}", detect_platform(url))
+        inc("fetch_tier_total", tier="browser", result=e.kind)
+        # Don't pin the URL to a tier that failed too (e.g. an out-of-stock page without a price)
+        clear_escalation(url)
+        record_failure(url, e)
+        print("Amazon Scraping Error:", e, file=sys.stderr)
+        return None
+    record_success(url)
+    inc("fetch_tier_total", tier="browser", result="ok")
+    return dict(product, tier="browser")
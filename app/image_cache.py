@@ -0,0 +1,143 @@
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+
+import requests
+
+from metrics import inc, timer
+from scraper import HEADERS
+
+# Directory holding resized product thumbnails, named by the SHA-256 of the original image
+CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", "image_cache")
+
+# Thumbnails are resized to fit within this box
+THUMBNAIL_SIZE = (300, 300)
+
+# Least recently used thumbnails are evicted once the cache grows past this size
+MAX_CACHE_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 100 * 1024 * 1024))
+
+_lock = threading.Lock()
+_index = None
+
+
+##############################
+# URL INDEX
+##############################
+def _index_path():
+    return os.path.join(CACHE_DIR, "index.json")
+
+
+def _load_index():
+    # Maps image URL -> content hash, so a cached image is served without re-downloading it
+    global _index
+    if _index is None:
+        _index = {}
+        if os.path.exists(_index_path()):
+            try:
+                with open(_index_path(), 'r') as f:
+                    _index = json.load(f)
+            except:
+                _index = {}
+    return _index
+
+
+def _save_index():
+    tmp = _index_path() + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(_index, f)
+    os.replace(tmp, _index_path())
+
+
+def _thumbnail_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.jpg")
+
+
+##############################
+# THUMBNAILS
+##############################
+def make_thumbnail(content, size=THUMBNAIL_SIZE):
+    # Resize with Pillow when it is installed; otherwise keep the original bytes
+    try:
+        from PIL import Image
+    except ImportError:
+        return content
+    with Image.open(io.BytesIO(content)) as image:
+        image.thumbnail(size)
+        out = io.BytesIO()
+        image.convert("RGB").save(out, format="JPEG", quality=85, optimize=True)
+    return out.getvalue()
+
+
+def evict(max_bytes=MAX_CACHE_BYTES):
+    # Remove least recently used thumbnails (by mtime, touched on every hit) until under budget
+    entries = []
+    with os.scandir(CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith(".jpg"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    evicted = set()
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        evicted.add(os.path.basename(path)[:-len(".jpg")])
+    if evicted:
+        # Drop the URLs pointing at evicted thumbnails so the index doesn't grow without bound
+        with _lock:
+            index = _load_index()
+            for url in [url for url, key in index.items() if key in evicted]:
+                del index[url]
+            _save_index()
+        inc("image_cache_evictions_total", len(evicted))
+    return len(evicted)
+
+
+def cache_image(url):
+    # Download an image once and store its thumbnail. Returns the local path, or None on failure.
+    if not url:
+        return None
+    with _lock:
+        key = _load_index().get(url)
+    if key and os.path.exists(_thumbnail_path(key)):
+        os.utime(_thumbnail_path(key))
+        inc("image_cache_total", result="hit")
+        return _thumbnail_path(key)
+
+    try:
+        with timer("image_download"):
+            response = requests.get(url, headers=HEADERS, timeout=10)
+            response.raise_for_status()
+        key = hashlib.sha256(response.content).hexdigest()
+        path = _thumbnail_path(key)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        if not os.path.exists(path):
+            with timer("image_resize"):
+                thumbnail = make_thumbnail(response.content)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(thumbnail)
+            os.replace(tmp, path)
+        with _lock:
+            _load_index()[url] = key
+            _save_index()
+        evict()
+    except Exception as e:
+        inc("image_cache_total", result="error")
+        print("Image Cache Error:", e, file=sys.stderr)
+        return None
+    inc("image_cache_total", result="miss")
+    return path
+
+
+def thumbnail(url):
+    # What to hand to st.image: the cached thumbnail, or the remote URL if it couldn't be cached
+    return cache_image(url) or url
@@ -0,0 +1,155 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+from price_history import convert_products
+from product_store import load_tracked_products
+from tracker import list_products, price_trend, save_products, track_product
+
+# Load-test harness: N simulated Streamlit users add, list and visualize products against a fake
+# scraper, driving the same service functions as web_app.py. Reports latency percentiles per
+# operation, products lost to concurrent saves and memory held per session.
+#
+#   python load_test.py --users 50 --ops 20
+
+OPERATION_MIX = [("add", 0.4), ("list", 0.4), ("visualize", 0.2)]
+
+
+def fake_fetch(url, latency):
+    # Stand-in for fetch_product_details: fixed name, a price that is the same on every run (str hash()
+    # is salted per process), simulated network time
+    time.sleep(random.uniform(0.5, 1.5) * latency)
+    return f"Product {url.rsplit('/', 1)[-1]}", float(100 + zlib.crc32(url.encode()) % 900), "Amazon"
+
+
+def deep_size(obj, seen=None):
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_size(item, seen) for item in obj)
+    return size
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class SimulatedUser:
+    def __init__(self, user_id, path, ops, latency, barrier):
+        self.user_id = user_id
+        self.path = path
+        self.ops = ops
+        self.latency = latency
+        self.barrier = barrier
+        self.timings = {name: [] for name, _ in OPERATION_MIX}
+        self.added = []
+        self.errors = 0
+        self.empty_loads = 0
+        self.session_bytes = 0
+
+    def run(self):
+        rng = random.Random(self.user_id)
+        self.barrier.wait()
+        # Each Streamlit session loads the store once into st.session_state
+        products = convert_products(load_tracked_products(self.path))
+        if not products and os.path.getsize(self.path) > 2:
+            self.empty_loads += 1
+
+        for op_index in range(self.ops):
+            op = rng.choices([name for name, _ in OPERATION_MIX], [w for _, w in OPERATION_MIX])[0]
+            start = time.perf_counter()
+            try:
+                if op == "add":
+                    url = f"https://www.amazon.in/dp/U{self.user_id}P{op_index}"
+                    name, price, platform = fake_fetch(url, self.latency)
+                    track_product(products, url, name, price, platform, path=self.path)
+                    save_products(self.path)
+                    self.added.append(url)
+                elif op == "list":
+                    list_products(products)
+                elif products:
+                    price_trend(products, rng.choice(list(products)))
+            except Exception as e:
+                self.errors += 1
+                print(f"User {self.user_id} {op} failed:", e)
+            self.timings[op].append(time.perf_counter() - start)
+
+        self.session_bytes = deep_size(products)
+
+
+def run_load_test(users=20, ops=20, latency=0.05, seed_products=100, path=None):
+    tmp = None
+    if path is None:
+        tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp.name, "tracked_products.json")
+
+    # Seed the store so list/visualize have something to read
+    seed = {}
+    for i in range(seed_products):
+        track_product(seed, f"https://www.amazon.in/dp/SEED{i}", f"Seed {i}", float(100 + i), "Amazon",
+                      "2026-01-01 00:00:00", path)
+    save_products(path)
+
+    barrier = threading.Barrier(users)
+    simulated = [SimulatedUser(i, path, ops, latency, barrier) for i in range(users)]
+    threads = [threading.Thread(target=user.run) for user in simulated]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    final = load_tracked_products(path)
+    expected = {url for user in simulated for url in user.added}
+    lost = expected - set(final)
+
+    report = {
+        "users": users,
+        "ops_per_user": ops,
+        "elapsed_s": round(elapsed, 2),
+        "ops_per_second": round(users * ops / elapsed, 1),
+        "latency_ms": {},
+        "products_added": len(expected),
+        "lost_writes": len(lost),
+        "lost_write_pct": round(len(lost) / len(expected) * 100, 1) if expected else 0.0,
+        "empty_loads": sum(user.empty_loads for user in simulated),
+        "errors": sum(user.errors for user in simulated),
+        "session_kb_avg": round(sum(user.session_bytes for user in simulated) / users / 1024, 1),
+        "session_kb_max": round(max(user.session_bytes for user in simulated) / 1024, 1),
+    }
+    for name, _ in OPERATION_MIX:
+        samples = [t for user in simulated for t in user.timings[name]]
+        report["latency_ms"][name] = {
+            "count": len(samples),
+            "p50": round(percentile(samples, 0.5) * 1000, 2) if samples else None,
+            "p95": round(percentile(samples, 0.95) * 1000, 2) if samples else None,
+            "p99": round(percentile(samples, 0.99) * 1000, 2) if samples else None,
+        }
+    if tmp:
+        tmp.cleanup()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate concurrent users against the tracker services")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 50], help="concurrent users per run")
+    parser.add_argument("--ops", type=int, default=20, help="operations per user")
+    parser.add_argument("--latency-ms", type=float, default=50, help="fake scraper latency")
+    parser.add_argument("--seed-products", type=int, default=100, help="products in the store before the run")
+    args = parser.parse_args()
+    for users in args.users:
+        print(run_load_test(users, args.ops, args.latency_ms / 1000, args.seed_products))
@@ -1,23 +1,19 @@
 import streamlit as st
 import sqlite3
-import hashlib
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
 import matplotlib.pyplot as plt
-import numpy as np
 import re
 import random
-import time
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import IsolationForest
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 # Add the import for inf
 import math
 from math import inf
+from fetch_strategy import fetch_product_tiered
+from events import publish_price_change
+from image_cache import thumbnail
+from auth import register_user, login_user, create_session, get_session, end_session
+from analytics import predict_future_price, detect_anomalies
 
 #########################
 # SCRAPER CONFIGURATION
@@ -28,12 +24,6 @@ USER_AGENTS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)..."
 ]
 
-def setup_driver():
-    options = Options()
-    options.add_argument("--headless")
-    service = Service()  # Add path to chromedriver if needed: Service("/path/to/chromedriver")
-    return webdriver.Chrome(service=service, options=options)
-
 def tokenize(text):
     text = text.lower()
     text = re.sub(r'[^a-z0-9\s]', '', text)
@@ -46,21 +36,8 @@ def clean_text(text):
 # AMAZON SCRAPER
 ##############################
 def scrape_amazon_product(url):
-    driver = setup_driver()
-    driver.get(url)
-    time.sleep(3)
-
-    try:
-        title = driver.find_element(By.ID, 'productTitle').text
-        price_elem = driver.find_element(By.CSS_SELECTOR, '.a-price .a-offscreen')
-        price = price_elem.get_attribute('innerHTML')
-        image = driver.find_element(By.ID, 'landingImage').get_attribute('src')
-        driver.quit()
-        return {"title": title, "price": price, "link": url, "image": image}
-    except Exception as e:
-        print("Amazon Scraping Error:", e)
-        driver.quit()
-        return None
+    # Plain HTTP first; falls back to a pooled headless browser for bot-walled / JS-rendered pages
+    return fetch_product_tiered(url)
 
 ##############################
 # FLIPKART SCRAPER
@@ -111,17 +88,6 @@ def get_flipkart_price(product_title):
 ##############################
 # DATABASE
 ##############################
-def create_user_db():
-    conn = sqlite3.connect("users.db")
-    cursor = conn.cursor()
-    cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL)''')
-    conn.commit()
-    conn.close()
-
 def init_product_db():
     conn = sqlite3.connect("products.db")
     cursor = conn.cursor()
@@ -157,55 +123,16 @@ def load_tracked_products(conn):
 ##############################
 # AUTH
 ##############################
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def register_user(name, email, password):
-    hashed = hash_password(password)
-    conn = sqlite3.connect("users.db")
-    cursor = conn.cursor()
-    try:
-        cursor.execute("INSERT INTO users (name, email, password) VALUES (?, ?, ?)", (name, email, hashed))
-        conn.commit()
-        return "✅ Registration Successful!"
-    except sqlite3.IntegrityError:
-        return "⚠️ Email already exists!"
-    finally:
-        conn.close()
-
-def login_user(email, password):
-    hashed = hash_password(password)
-    conn = sqlite3.connect("users.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE email = ? AND password = ?", (email, hashed))
-    return cursor.fetchone()
-
 def logout_user():
+    end_session(st.session_state.get("session_token"))
+    st.session_state["session_token"] = None
     st.session_state["authenticated"] = False
     st.session_state["user_email"] = None
     st.rerun()
 
-##############################
-# ML
-##############################
-def predict_future_price(prices):
-    if len(prices) < 2: return None
-    X = np.arange(len(prices)).reshape(-1, 1)
-    y = np.array(prices).reshape(-1, 1)
-    model = LinearRegression()
-    model.fit(X, y)
-    return model.predict([[len(prices)]])[0][0]
-
-def detect_anomalies(prices):
-    if len(prices) < 2: return []
-    model = IsolationForest(contamination=0.1)
-    preds = model.fit_predict(np.array(prices).reshape(-1, 1))
-    return [i for i, p in enumerate(preds) if p == -1]
-
 ##############################
 # STREAMLIT APP
 ##############################
-create_user_db()
 conn = init_product_db()
 
 if "tracked_products" not in st.session_state:
@@ -213,7 +140,10 @@ if "tracked_products" not in st.session_state:
 
 st.title("🛒 E-Commerce Price Tracker")
 
-if not st.session_state.get("authenticated", False):
+# Session tokens are checked in memory, so reruns don't query users.db
+st.session_state["authenticated"] = get_session(st.session_state.get("session_token")) is not None
+
+if not st.session_state["authenticated"]:
     tab1, tab2 = st.tabs(["Register", "Login"])
     with tab1:
         name = st.text_input("Full Name")
@@ -228,6 +158,7 @@ if not st.session_state.get("authenticated", False):
         if st.button("Login"):
             user = login_user(email, password)
             if user:
+                st.session_state["session_token"] = create_session(email)
                 st.session_state["authenticated"] = True
                 st.session_state["user_email"] = email
                 st.rerun()
@@ -257,7 +188,8 @@ else:
                 col1, col2 = st.columns(2)
                 with col1:
                     st.markdown("### 🛒 Amazon")
-                    st.image(amazon['image'], width=200)
+                    if amazon.get('image'):
+                        st.image(thumbnail(amazon['image']), width=200)
                     st.markdown(f"**{amazon['title']}**")
                     st.markdown(f"Price: ₹{amazon['price']}")
                     st.markdown(f"[Link]({amazon['link']})")
@@ -284,7 +216,10 @@ else:
                         "threshold": threshold
                     }
                 else:
-                    st.session_state["tracked_products"][url]["prices"].append((timestamp, price_val))
+                    prices = st.session_state["tracked_products"][url]["prices"]
+                    old_price = prices[-1][1] if prices else None
+                    prices.append((timestamp, price_val))
+                    publish_price_change(url, st.session_state["tracked_products"][url], old_price, price_val, timestamp)
 
                 save_tracked_product(conn, url, amazon["title"], st.session_state["tracked_products"][url]["prices"])
                 st.success(f"Tracking '{amazon['title']}' at ₹{price_val}")
@@ -0,0 +1,257 @@
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Port for the Prometheus /metrics endpoint and the routes added with add_route() (e.g. /deals)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 9100))
+
+# Histogram buckets (seconds) for stage timings
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Recent samples kept per histogram for percentile summaries on the admin page
+RECENT_SAMPLES = 1000
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+##############################
+# RECORDING
+##############################
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name, value, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {
+                "buckets": [0] * len(DEFAULT_BUCKETS),
+                "sum": 0.0,
+                "count": 0,
+                "recent": deque(maxlen=RECENT_SAMPLES),
+            }
+        for i, bound in enumerate(DEFAULT_BUCKETS):
+            if value <= bound:
+                hist["buckets"][i] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+        hist["recent"].append(value)
+
+
+@contextmanager
+def timer(stage, **labels):
+    # Time a hot-path stage; failures are counted separately and re-raised
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        inc("stage_errors_total", stage=stage, **labels)
+        raise
+    finally:
+        observe("stage_duration_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+
+def timed(stage):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def drain():
+    # Take (and clear) everything recorded so far; used to ship a child process's metrics home
+    with _lock:
+        snapshot = {
+            "counters": dict(_counters),
+            "histograms": {key: dict(hist, recent=list(hist["recent"])) for key, hist in _histograms.items()},
+        }
+        _counters.clear()
+        _histograms.clear()
+    return snapshot
+
+
+def merge(snapshot):
+    # Add a drained snapshot from another process into this registry
+    with _lock:
+        for key, value in snapshot["counters"].items():
+            _counters[key] = _counters.get(key, 0) + value
+        for key, other in snapshot["histograms"].items():
+            hist = _histograms.get(key)
+            if hist is None:
+                hist = _histograms[key] = {
+                    "buckets": [0] * len(DEFAULT_BUCKETS),
+                    "sum": 0.0,
+                    "count": 0,
+                    "recent": deque(maxlen=RECENT_SAMPLES),
+                }
+            hist["buckets"] = [a + b for a, b in zip(hist["buckets"], other["buckets"])]
+            hist["sum"] += other["sum"]
+            hist["count"] += other["count"]
+            hist["recent"].extend(other["recent"])
+
+
+##############################
+# EXPORT
+##############################
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = [(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def render_prometheus():
+    # Render all metrics in the Prometheus text exposition format
+    lines = []
+    with _lock:
+        seen = set()
+        for (name, labels), value in sorted(_counters.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), value in sorted(_gauges.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {name} gauge")
+                seen.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), hist in sorted(_histograms.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            for bound, count in zip(DEFAULT_BUCKETS, hist["buckets"]):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {hist['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {hist['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {hist['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def _percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def stage_summary():
+    # Per-stage timing summary used by the admin page
+    rows = []
+    with _lock:
+        # Errors and timings share the same label set, so each row matches its own error count
+        errors = {labels: value for (name, labels), value in _counters.items() if name == "stage_errors_total"}
+        for (name, labels), hist in sorted(_histograms.items()):
+            if name != "stage_duration_seconds":
+                continue
+            recent = list(hist["recent"])
+            rows.append({
+                "stage": dict(labels).get("stage"),
+                "labels": ", ".join(f"{k}={v}" for k, v in labels if k != "stage"),
+                "calls": hist["count"],
+                "errors": errors.get(labels, 0),
+                "avg_ms": round(hist["sum"] / hist["count"] * 1000, 2) if hist["count"] else 0.0,
+                "p50_ms": round(_percentile(recent, 0.5) * 1000, 2) if recent else None,
+                "p95_ms": round(_percentile(recent, 0.95) * 1000, 2) if recent else None,
+                "total_s": round(hist["sum"], 3),
+            })
+    return rows
+
+
+def counter_summary():
+    with _lock:
+        return [{"metric": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(_counters.items()) if name != "stage_errors_total"]
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+
+##############################
+# HTTP ENDPOINT
+##############################
+def send_body(request, body, content_type, status=200):
+    request.send_response(status)
+    request.send_header("Content-Type", content_type)
+    request.send_header("Content-Length", str(len(body)))
+    request.end_headers()
+    request.wfile.write(body)
+
+
+def _serve_metrics(request, query):
+    send_body(request, render_prometheus().encode(), "text/plain; version=0.0.4")
+
+
+# Path -> handler(request, query) for GET requests on the metrics port; other modules add their
+# endpoints with add_route() instead of opening a port each
+_routes = {"/metrics": _serve_metrics}
+
+
+def add_route(path, handler):
+    _routes[path] = handler
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        handler = _routes.get(parsed.path)
+        if handler is None:
+            self.send_error(404)
+            return
+        handler(self, {key: values[0] for key, values in parse_qs(parsed.query).items()})
+
+    def log_message(self, format, *args):
+        pass
+
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+def start_http_server(name, handler_class, port, host="0.0.0.0"):
+    # Start a server once per process under `name`; Streamlit reruns the script on every interaction
+    with _servers_lock:
+        if name in _servers:
+            return _servers[name]
+        try:
+            server = ThreadingHTTPServer((host, port), handler_class)
+        except OSError as e:
+            print(f"{name.capitalize()} Server Error:", e, file=sys.stderr)
+            return None
+        threading.Thread(target=server.serve_forever, name=f"{name}-server", daemon=True).start()
+        _servers[name] = server
+        return server
+
+
+def start_metrics_server(port=METRICS_PORT, host="0.0.0.0"):
+    # /metrics plus every route added with add_route()
+    return start_http_server("metrics", _MetricsHandler, port, host)
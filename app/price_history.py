@@ -0,0 +1,102 @@
+import os
+
+# Storage mode for price histories:
+#   "compact" - store price changes as [start_ts, end_ts, price] intervals plus a last_checked timestamp
+#   "raw"     - store every check as a (timestamp, price) point (original behaviour)
+STORAGE_MODE = os.environ.get("PRICE_STORAGE_MODE", "compact")
+
+
+##############################
+# COMPACTION
+##############################
+def compact_prices(prices):
+    # Run-length encode a raw (timestamp, price) series into change intervals
+    intervals = []
+    for timestamp, price in prices:
+        if intervals and intervals[-1][2] == price:
+            intervals[-1][1] = timestamp
+        else:
+            intervals.append([timestamp, timestamp, price])
+    return intervals
+
+
+def expand_intervals(intervals):
+    # Expand intervals back into a (timestamp, price) series. Each interval yields its
+    # first and last reading, which is enough to redraw the series exactly as a step chart.
+    prices = []
+    for start, end, price in intervals:
+        prices.append((start, price))
+        if end != start:
+            prices.append((end, price))
+    return prices
+
+
+##############################
+# PRODUCT RECORDS
+##############################
+def is_compact(details):
+    return "intervals" in details
+
+
+def new_product(name, timestamp, price, platform, mode=None):
+    details = {'name': name, 'platform': platform}
+    if (mode or STORAGE_MODE) == "compact":
+        details['intervals'] = [[timestamp, timestamp, price]]
+        details['last_checked'] = timestamp
+    else:
+        details['prices'] = [(timestamp, price)]
+    return details
+
+
+def record_price(details, timestamp, price):
+    # Append a reading and return the previous price (None if there was none)
+    old_price = latest_price(details)
+    if is_compact(details):
+        intervals = details['intervals']
+        if intervals and intervals[-1][2] == price:
+            intervals[-1][1] = timestamp
+        else:
+            intervals.append([timestamp, timestamp, price])
+        details['last_checked'] = timestamp
+    else:
+        details.setdefault('prices', []).append((timestamp, price))
+    return old_price
+
+
+def get_prices(details):
+    if is_compact(details):
+        return expand_intervals(details['intervals'])
+    return [tuple(point) for point in details.get('prices', [])]
+
+
+def latest_price(details):
+    if is_compact(details):
+        return details['intervals'][-1][2] if details['intervals'] else None
+    prices = details.get('prices')
+    return prices[-1][1] if prices else None
+
+
+def last_checked(details):
+    if is_compact(details):
+        return details.get('last_checked')
+    prices = details.get('prices')
+    return prices[-1][0] if prices else None
+
+
+def convert_product(details, mode=None):
+    # Convert a product record in place to the given storage mode
+    mode = mode or STORAGE_MODE
+    if mode == "compact" and not is_compact(details):
+        prices = details.pop('prices', [])
+        details['intervals'] = compact_prices(prices)
+        details['last_checked'] = prices[-1][0] if prices else None
+    elif mode == "raw" and is_compact(details):
+        details['prices'] = expand_intervals(details.pop('intervals'))
+        details.pop('last_checked', None)
+    return details
+
+
+def convert_products(products, mode=None):
+    for details in products.values():
+        convert_product(details, mode)
+    return products
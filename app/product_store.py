@@ -0,0 +1,216 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to an in-process lock
+    fcntl = None
+
+from events import publish_price_change
+from metrics import inc, timed, timer
+from price_history import convert_product, new_product, record_price
+
+# File to store tracked products
+DATA_FILE = "tracked_products.json"
+
+# Background flush interval for readings queued in the write-behind buffer
+FLUSH_INTERVAL_SECONDS = float(os.environ.get("STORE_FLUSH_SECONDS", 1.0))
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _file_lock(path):
+    # Exclusive lock on "<path>.lock", shared by every thread, session and worker process
+    if fcntl is None:
+        with _thread_locks_guard:
+            lock = _thread_locks.setdefault(os.path.abspath(path), threading.Lock())
+        with lock:
+            yield
+        return
+    with open(path + ".lock", 'w') as lock_file:
+        with timer("store_lock_wait"):
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_atomic(data, path, indent=4):
+    # Write to a temp file in the same directory, then swap it in; readers never see a partial file
+    directory = os.path.dirname(os.path.abspath(path))
+    prefix = "." + os.path.splitext(os.path.basename(path))[0] + "."
+    with tempfile.NamedTemporaryFile('w', dir=directory, prefix=prefix, suffix=".tmp", delete=False) as f:
+        tmp = f.name
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        # Only left behind if the write or the swap failed
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def read_json(path, default=dict):
+    # Read a JSON file written by _write_atomic; `default()` when it doesn't exist yet
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except ValueError as e:
+            # Keep the unreadable file for recovery instead of letting the next save overwrite it
+            backup = f"{path}.corrupt-{int(time.time())}"
+            os.replace(path, backup)
+            print(f"{os.path.basename(path)} is corrupt ({e}); moved to {backup}", file=sys.stderr)
+    return default()
+
+
+_cached = {}
+
+
+def read_json_cached(path, default=dict):
+    # read_json, re-parsed only when the file has been replaced since the last read. Callers
+    # share the returned object and must not modify it.
+    try:
+        stat = os.stat(path)
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return default()
+    key = os.path.abspath(path)
+    cached = _cached.get(key)
+    if cached is None or cached[0] != version:
+        cached = _cached[key] = (version, read_json(path, default))
+    return cached[1]
+
+
+@contextmanager
+def locked_json(path, default=dict, indent=4):
+    # Read-modify-write a JSON file under its file lock, re-reading the current contents first so
+    # updates from other threads and processes aren't overwritten
+    with _file_lock(path):
+        data = read_json(path, default)
+        yield data
+        _write_atomic(data, path, indent)
+
+
+# Function to load tracked products from file
+@timed("load_tracked_products")
+def load_tracked_products(path=DATA_FILE):
+    return read_json(path)
+
+# Function to save tracked products to file
+@timed("save_tracked_products")
+def save_tracked_products(products, path=DATA_FILE):
+    with _file_lock(path):
+        _write_atomic(products, path)
+
+
+@contextmanager
+def locked_products(path=DATA_FILE):
+    # Read-modify-write the whole store under the file lock (used by the rollup job)
+    with _file_lock(path):
+        products = load_tracked_products(path)
+        yield products
+        with timer("save_tracked_products"):
+            _write_atomic(products, path)
+
+
+##############################
+# WRITE-BEHIND BUFFER
+##############################
+class WriteBehindBuffer:
+    # Queues price readings and applies them to the latest file contents in one locked write.
+    # Readings are replayed rather than whole products overwritten, so sessions holding stale
+    # copies of the store can't clobber each other's updates.
+    def __init__(self, path):
+        self.path = path
+        self.pending = []
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.flusher = None
+
+    def add(self, url, name, price, platform, timestamp):
+        with self.lock:
+            self.pending.append((url, name, price, platform, timestamp))
+        inc("store_readings_queued_total")
+        self._start_flusher()
+
+    def flush(self):
+        # Serialised so a caller returning from flush() knows its readings are on disk
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, []
+            if not pending:
+                return []
+            changes = []
+            try:
+                with _file_lock(self.path):
+                    products = load_tracked_products(self.path)
+                    for url, name, price, platform, timestamp in pending:
+                        if url not in products:
+                            products[url] = new_product(name, timestamp, price, platform)
+                            continue
+                        # Records written before compaction was enabled are migrated as they're updated,
+                        # since only the session copies are converted when the app loads the store
+                        convert_product(products[url])
+                        old_price = record_price(products[url], timestamp, price)
+                        if platform != 'Manual':
+                            products[url]['platform'] = platform
+                        changes.append((url, products[url], old_price, price, timestamp))
+                    with timer("save_tracked_products"):
+                        _write_atomic(products, self.path)
+            except Exception:
+                # Nothing was written: put the readings back ahead of any queued since, for the next flush
+                with self.lock:
+                    self.pending = pending + self.pending
+                inc("store_flush_errors_total")
+                raise
+            inc("store_flushes_total")
+            inc("store_readings_flushed_total", len(pending))
+            for change in changes:
+                publish_price_change(*change)
+            return changes
+
+    def _start_flusher(self):
+        if self.flusher and self.flusher.is_alive():
+            return
+
+        def loop():
+            while True:
+                time.sleep(FLUSH_INTERVAL_SECONDS)
+                try:
+                    self.flush()
+                except Exception as e:
+                    print("Store Flush Error:", e, file=sys.stderr)
+
+        self.flusher = threading.Thread(target=loop, name="store-flusher", daemon=True)
+        self.flusher.start()
+
+
+_buffers = {}
+
+
+def get_buffer(path=DATA_FILE):
+    with _thread_locks_guard:
+        key = os.path.abspath(path)
+        if key not in _buffers:
+            _buffers[key] = WriteBehindBuffer(path)
+        return _buffers[key]
+
+
+def queue_reading(url, name, price, platform, timestamp, path=DATA_FILE):
+    get_buffer(path).add(url, name, price, platform, timestamp)
+
+
+def flush_pending(path=DATA_FILE):
+    return get_buffer(path).flush()
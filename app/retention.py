@@ -0,0 +1,212 @@
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from price_history import is_compact, get_prices
+from product_store import DATA_FILE, locked_products
+
+# Retention tiers:
+#   raw    - individual readings (or change intervals) for RAW_RETENTION_DAYS
+#   hourly - [hour, open, high, low, close] rows for HOURLY_RETENTION_DAYS
+#   daily  - [day, open, high, low, close] rows, kept forever
+RAW_RETENTION_DAYS = int(os.environ.get("RAW_RETENTION_DAYS", 7))
+HOURLY_RETENTION_DAYS = int(os.environ.get("HOURLY_RETENTION_DAYS", 90))
+ROLLUP_INTERVAL_SECONDS = int(os.environ.get("ROLLUP_INTERVAL_SECONDS", 3600))
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+TIERS = ["raw", "hourly", "daily"]
+
+
+def _cutoffs(now=None):
+    now = now or datetime.now()
+    raw_cutoff = (now - timedelta(days=RAW_RETENTION_DAYS)).strftime(TIMESTAMP_FORMAT)
+    hourly_cutoff = (now - timedelta(days=HOURLY_RETENTION_DAYS)).strftime(TIMESTAMP_FORMAT)
+    return raw_cutoff, hourly_cutoff
+
+
+def _bucket(timestamp, tier):
+    # Timestamps are '%Y-%m-%d %H:%M:%S' strings, so buckets are plain prefixes
+    if tier == "hourly":
+        return timestamp[:13] + ":00:00"
+    return timestamp[:10] + " 00:00:00"
+
+
+def _fold(rows, bucket, open_, high, low, close):
+    # Merge an OHLC row into a bucketed tier, keeping rows sorted by bucket
+    if rows and rows[-1][0] == bucket:
+        row = rows[-1]
+    elif not rows or rows[-1][0] < bucket:
+        rows.append([bucket, open_, high, low, close])
+        return
+    else:
+        index = bisect_left([r[0] for r in rows], bucket)
+        if index < len(rows) and rows[index][0] == bucket:
+            row = rows[index]
+        else:
+            rows.insert(index, [bucket, open_, high, low, close])
+            return
+    row[2] = max(row[2], high)
+    row[3] = min(row[3], low)
+    row[4] = close
+
+
+def _fold_point(rows, tier, timestamp, price):
+    _fold(rows, _bucket(timestamp, tier), price, price, price, price)
+
+
+##############################
+# ROLLUP
+##############################
+def apply_retention(details, now=None):
+    # Incrementally move aged raw readings into the hourly tier and aged hourly rows into the
+    # daily tier. The latest reading always stays raw so the current price is never rolled away.
+    # Returns the number of raw points and hourly rows that were rolled up.
+    raw_cutoff, hourly_cutoff = _cutoffs(now)
+    rollups = details.setdefault('rollups', {'hourly': [], 'daily': []})
+    hourly, daily = rollups['hourly'], rollups['daily']
+    moved = 0
+
+    if is_compact(details):
+        intervals = details['intervals']
+        kept = []
+        for i, interval in enumerate(intervals):
+            start, end, price = interval
+            is_last = i == len(intervals) - 1
+            if end < raw_cutoff and not is_last:
+                _fold_point(hourly, "hourly", start, price)
+                if end != start:
+                    _fold_point(hourly, "hourly", end, price)
+                moved += 1
+            elif start < raw_cutoff and end > start:
+                # The price held across the cutoff: roll up the old part, keep the rest raw
+                _fold_point(hourly, "hourly", start, price)
+                interval[0] = min(raw_cutoff, end)
+                kept.append(interval)
+                moved += 1
+            else:
+                kept.append(interval)
+        details['intervals'] = kept
+    else:
+        prices = details.get('prices', [])
+        kept = []
+        for i, (timestamp, price) in enumerate(prices):
+            if timestamp < raw_cutoff and i < len(prices) - 1:
+                _fold_point(hourly, "hourly", timestamp, price)
+                moved += 1
+            else:
+                kept.append((timestamp, price))
+        details['prices'] = kept
+
+    aged = [row for row in hourly if row[0] < hourly_cutoff]
+    if aged:
+        for bucket, open_, high, low, close in aged:
+            _fold(daily, _bucket(bucket, "daily"), open_, high, low, close)
+        rollups['hourly'] = [row for row in hourly if row[0] >= hourly_cutoff]
+        moved += len(aged)
+    return moved
+
+
+def apply_retention_all(products, now=None):
+    return sum(apply_retention(details, now) for details in products.values())
+
+
+##############################
+# QUERIES
+##############################
+def select_tier(start, now=None):
+    # Pick the coarsest tier needed to cover a range beginning at `start` (None = all time)
+    raw_cutoff, hourly_cutoff = _cutoffs(now)
+    if start is not None and start >= raw_cutoff:
+        return "raw"
+    if start is not None and start >= hourly_cutoff:
+        return "hourly"
+    return "daily"
+
+
+def query_history(details, start=None, end=None, now=None):
+    # Return (tier, [(timestamp, price), ...]) for the requested range. Finer tiers are rolled
+    # up on the fly into the selected tier's buckets so the series has no gaps at tier boundaries.
+    tier = select_tier(start, now)
+    raw_points = get_prices(details)
+
+    if tier == "raw":
+        points = raw_points
+    else:
+        rollups = details.get('rollups', {})
+        rows = [list(row) for row in rollups.get(tier, [])]
+        finer = rollups.get('hourly', []) if tier == "daily" else []
+        for bucket, open_, high, low, close in finer:
+            _fold(rows, _bucket(bucket, tier), open_, high, low, close)
+        for timestamp, price in raw_points:
+            _fold_point(rows, tier, timestamp, price)
+        points = [(row[0], row[4]) for row in rows]
+
+    # Compact intervals and rollup rows only store their endpoints, so clip the series to the
+    # range: a price that held across `start` (or `end`) still shows up at that edge
+    in_range = [(ts, price) for ts, price in points
+                if (start is None or ts >= start) and (end is None or ts <= end)]
+    if start is not None and (not in_range or in_range[0][0] > start):
+        price = _price_at(details, points, start)
+        if price is not None and (end is None or start <= end):
+            in_range.insert(0, (start, price))
+    if end is not None and in_range and in_range[-1][0] < end and points and points[-1][0] > end:
+        in_range.append((end, in_range[-1][1]))
+    return tier, in_range
+
+
+def _price_at(details, points, timestamp):
+    # Price in effect just before `timestamp`: the last reading before it in the queried series,
+    # falling back to rolled-up tiers when the raw series starts later
+    before = [price for ts, price in points if ts < timestamp]
+    if before:
+        return before[-1]
+    rollups = details.get('rollups', {})
+    for tier in ("hourly", "daily"):
+        rows = [row for row in rollups.get(tier, []) if row[0] < timestamp]
+        if rows:
+            return rows[-1][4]
+    return None
+
+
+def full_history(details):
+    # Every stored point at its own resolution: daily and hourly rollups (close price), then raw readings
+    rollups = details.get('rollups', {})
+    for tier in ("daily", "hourly"):
+        for bucket, _, _, _, close in rollups.get(tier, []):
+            yield tier, bucket, close
+    for ts, price in get_prices(details):
+        yield "raw", ts, price
+
+
+##############################
+# BACKGROUND JOB
+##############################
+_job_thread = None
+
+
+def run_retention(path=DATA_FILE, now=None):
+    # Under the store lock so readings flushed meanwhile aren't overwritten by the rolled-up copy
+    with locked_products(path) as products:
+        return apply_retention_all(products, now)
+
+
+def start_retention_job(interval=ROLLUP_INTERVAL_SECONDS, path=DATA_FILE):
+    # Start the rollup job once per process; Streamlit reruns the script on every interaction
+    global _job_thread
+    if _job_thread and _job_thread.is_alive():
+        return _job_thread
+
+    def loop():
+        while True:
+            try:
+                run_retention(path)
+            except Exception as e:
+                print("Retention Job Error:", e, file=sys.stderr)
+            time.sleep(interval)
+
+    _job_thread = threading.Thread(target=loop, name="retention-job", daemon=True)
+    _job_thread.start()
+    return _job_thread
@@ -0,0 +1,96 @@
+import random
+import time
+
+from product_store import locked_json, read_json_cached
+
+# File to persist failed scrapes waiting to be retried
+RETRY_QUEUE_FILE = "retry_queue.json"
+
+# Per-class backoff: delay = base * 2 ** (attempts - 1), capped at max_delay (seconds).
+# Transient failures retry quickly; layout breakages give up early and wait for a selector fix.
+RETRY_POLICIES = {
+    "network": {"base": 60, "max_delay": 3600, "max_attempts": 6},
+    "http_status": {"base": 300, "max_delay": 6 * 3600, "max_attempts": 5},
+    "bot_wall": {"base": 1800, "max_delay": 12 * 3600, "max_attempts": 4},
+    "selector_miss": {"base": 6 * 3600, "max_delay": 24 * 3600, "max_attempts": 2},
+    "parse_error": {"base": 6 * 3600, "max_delay": 24 * 3600, "max_attempts": 2},
+}
+
+# HTTP statuses that will not fix themselves
+PERMANENT_STATUSES = {404, 410}
+
+
+def _read(path=RETRY_QUEUE_FILE):
+    # Current queue as last written by any process; shared, so copy entries before handing them out
+    return read_json_cached(path)
+
+
+def backoff_delay(kind, attempts):
+    policy = RETRY_POLICIES.get(kind, RETRY_POLICIES["network"])
+    delay = min(policy["base"] * 2 ** (attempts - 1), policy["max_delay"])
+    return delay * random.uniform(0.9, 1.1)
+
+
+def record_failure(url, error, now=None, path=RETRY_QUEUE_FILE):
+    # Queue (or requeue) a failed URL with the backoff of its failure class
+    now = now or time.time()
+    kind = getattr(error, "kind", "parse_error")
+    status_code = getattr(error, "status_code", None)
+    with locked_json(path) as queue:
+        entry = queue.get(url)
+        if entry is None or entry["kind"] != kind:
+            entry = {"kind": kind, "attempts": 0, "first_failed": now}
+        entry["attempts"] += 1
+        entry["message"] = str(error)
+        entry["status_code"] = status_code
+        entry["last_failed"] = now
+        max_attempts = RETRY_POLICIES.get(kind, RETRY_POLICIES["network"])["max_attempts"]
+        entry["parked"] = entry["attempts"] >= max_attempts or status_code in PERMANENT_STATUSES
+        entry["next_attempt"] = None if entry["parked"] else now + backoff_delay(kind, entry["attempts"])
+        queue[url] = entry
+    return entry
+
+
+def record_success(url, path=RETRY_QUEUE_FILE):
+    # Called after every successful fetch, so only take the lock when the URL is actually queued
+    if url not in _read(path):
+        return
+    with locked_json(path) as queue:
+        queue.pop(url, None)
+
+
+def get_entry(url, path=RETRY_QUEUE_FILE):
+    entry = _read(path).get(url)
+    return dict(entry) if entry else None
+
+
+def list_entries(path=RETRY_QUEUE_FILE):
+    return {url: dict(entry) for url, entry in _read(path).items()}
+
+
+def due_retries(now=None, limit=None, path=RETRY_QUEUE_FILE, exclude=()):
+    # URLs whose backoff has elapsed, oldest first; parked entries and `exclude` are never due
+    now = now or time.time()
+    due = [(entry["next_attempt"], url) for url, entry in _read(path).items()
+           if not entry["parked"] and entry["next_attempt"] <= now and url not in exclude]
+    due.sort()
+    return [url for _, url in due[:limit]]
+
+
+def unpark(kind=None, path=RETRY_QUEUE_FILE):
+    # Make parked entries due again, e.g. after the selectors for a site have been fixed
+    now = time.time()
+    count = 0
+    with locked_json(path) as queue:
+        for entry in queue.values():
+            if entry["parked"] and (kind is None or entry["kind"] == kind):
+                entry["parked"] = False
+                entry["attempts"] = 0
+                entry["next_attempt"] = now
+                count += 1
+    return count
+
+
+def run_due_retries(fetch, now=None, limit=None, path=RETRY_QUEUE_FILE, exclude=()):
+    # Retry due URLs with `fetch(url)`; the fetcher records success/failure back into the queue
+    return {url: fetch(url) for url in due_retries(now, limit, path, exclude)}
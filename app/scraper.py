@@ -0,0 +1,290 @@
+import json
+import os
+import re
+import sys
+
+import requests
+from bs4 import BeautifulSoup
+
+from metrics import inc, timed, timer
+from retry_queue import record_failure, record_success
+from selector_stats import check_drift, ordered, record
+from streaming import read_streaming
+from structured_data import extract_structured, find_json_ld_product, json_ld_name_price, parse_price
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1"
+}
+
+# "structured" tries embedded JSON-LD / initial state before DOM selectors; "dom" skips it
+EXTRACTION_MODE = os.environ.get("EXTRACTION_MODE", "structured")
+
+# Stream page bodies and stop reading once name and price are found ("0" downloads whole pages)
+STREAM_MODE = os.environ.get("STREAM_MODE", "1") == "1"
+
+# Scrape failure classes (see retry_queue.RETRY_POLICIES for how each is retried)
+NETWORK = "network"
+HTTP_STATUS = "http_status"
+BOT_WALL = "bot_wall"
+SELECTOR_MISS = "selector_miss"
+PARSE_ERROR = "parse_error"
+
+# Text that only shows up on captcha / robot-check interstitials
+BOT_WALL_MARKERS = [
+    b"/errors/validatecaptcha",
+    b"robot check",
+    b"enter the characters you see below",
+    b"are you a human",
+    b"api-services-support@amazon.com",
+]
+
+class ScrapeError(Exception):
+    def __init__(self, kind, message, platform="Unknown", status_code=None):
+        super().__init__(message)
+        self.kind = kind
+        self.platform = platform
+        self.status_code = status_code
+
+    def __reduce__(self):
+        # Keep kind/platform when the error crosses a process boundary
+        return ScrapeError, (self.kind, str(self), self.platform, self.status_code)
+
+def detect_platform(url):
+    if "amazon" in url.lower():
+        return "Amazon"
+    elif "flipkart" in url.lower():
+        return "Flipkart"
+    return "Unknown"
+
+def is_bot_wall(content):
+    lowered = content.lower()
+    return any(marker in lowered for marker in BOT_WALL_MARKERS)
+
+def download_page(url, platform, stream=STREAM_MODE):
+    # Returns (content, fields); fields is (name, price) when a streamed read stopped early
+    try:
+        with timer("http_fetch"):
+            response = requests.get(url, headers=HEADERS, timeout=10, stream=stream)
+
+        if response.status_code >= 400:
+            kind = BOT_WALL if is_bot_wall(response.content) else HTTP_STATUS
+            raise ScrapeError(kind, f"HTTP {response.status_code}", platform, response.status_code)
+
+        if stream:
+            name, price, content, early = read_streaming(response, platform)
+            return content, (name, price) if early else None
+        return response.content, None
+    except requests.exceptions.RequestException as e:
+        raise ScrapeError(NETWORK, str(e), platform)
+
+# Function to extract (name, price, platform) from a downloaded page
+def parse_product(content, platform):
+    if EXTRACTION_MODE == "structured":
+        # Fast path: decode only the embedded JSON-LD / initial-state blobs, no DOM parse
+        try:
+            with timer("structured_extract", platform=platform):
+                name, price = extract_structured(content, platform)
+        except Exception as e:
+            name = price = None
+            print(f"Structured data error: {str(e)}", file=sys.stderr)
+        if name and price:
+            inc("extraction_path_total", platform=platform, path="structured")
+            return name, price, platform
+
+    inc("extraction_path_total", platform=platform, path="dom")
+    try:
+        with timer("html_parse"):
+            soup = BeautifulSoup(content, "html.parser")
+        if platform == "Amazon":
+            name, price, _ = fetch_amazon_details(soup)
+        else:
+            name, price, _ = fetch_flipkart_details(soup)
+    except Exception as e:
+        raise ScrapeError(PARSE_ERROR, str(e), platform)
+
+    if not name or not price:
+        kind = BOT_WALL if is_bot_wall(content) else SELECTOR_MISS
+        missing = "name" if not name else "price"
+        raise ScrapeError(kind, f"Could not find product {missing} on page", platform)
+    return name, price, platform
+
+# Function to scrape a product page, raising a classified ScrapeError on failure
+def scrape_product(url, stream=STREAM_MODE):
+    platform = detect_platform(url)
+    content, fields = download_page(url, platform, stream)
+    if fields:
+        inc("extraction_path_total", platform=platform, path="stream")
+        return fields[0], fields[1], platform
+    return parse_product(content, platform)
+
+# Function to fetch product details from a URL
+@timed("fetch_product_details")
+def fetch_product_details(url, stream=None):
+    if detect_platform(url) == "Unknown":
+        return None, None, "Unknown"
+    try:
+        name, price, platform = scrape_product(url, STREAM_MODE if stream is None else stream)
+    except ScrapeError as e:
+        inc("scrape_failures_total", platform=e.platform, kind=e.kind)
+        record_failure(url, e)
+        print(f"Error fetching product ({e.kind}): {str(e)}", file=sys.stderr)
+        return None, None, e.platform
+
+    record_success(url)
+    inc("scrape_results_total", platform=platform, result="ok")
+    return name, price, platform
+
+# Selectors for each field, primary (expected) selector first
+AMAZON_NAME_SELECTORS = [
+    {"id": "productTitle"},
+    {"class": "product-title-word-break"},
+    {"id": "title"}
+]
+AMAZON_PRICE_SELECTORS = [
+    {"class": "a-price-whole"},
+    {"class": "a-price"},
+    {"class": "priceblock_ourprice"},
+    {"class": "priceblock_dealprice"}
+]
+FLIPKART_NAME_SELECTORS = [
+    {"class": "VU-ZEz"},
+    {"class": "B_NuCI"},
+    {"class": "_35KyD6"}
+]
+FLIPKART_PRICE_SELECTORS = [
+    {"class": "Nx9bqj"},
+    {"class": "_30jeq3"},
+    {"class": "_25b18c"}
+]
+
+# Rupee amount in page text, e.g. "₹1,299" or "₹ 1299.00"
+RUPEE_PRICE_PATTERN = re.compile(r"₹\s*(\d[\d,]*(?:\.\d{1,2})?)")
+
+# How far past the title to look for a rupee amount
+PRICE_SEARCH_WINDOW = 3000
+
+@timed("extract_amazon")
+def fetch_amazon_details(soup):
+    # Try multiple selectors for product name, best recent hit rate first
+    name = None
+    for selector in ordered("Amazon", "name", AMAZON_NAME_SELECTORS):
+        element = soup.find("span", selector)
+        record("Amazon", "name", selector, element is not None)
+        if element:
+            name = element.get_text(strip=True)
+            break
+    check_drift("Amazon", "name", AMAZON_NAME_SELECTORS[0])
+    
+    # Try multiple selectors for price
+    price = None
+    for selector in ordered("Amazon", "price", AMAZON_PRICE_SELECTORS):
+        element = soup.find("span", selector)
+        if element:
+            price_text = element.get_text(strip=True)
+            # "a-price-whole" holds "1,299." with the paise in a sibling "a-price-fraction"
+            fraction = element.find_next_sibling("span", {"class": "a-price-fraction"})
+            if selector == {"class": "a-price-whole"} and fraction:
+                price_text = price_text.rstrip(".") + "." + fraction.get_text(strip=True)
+            price = parse_price(price_text)
+        record("Amazon", "price", selector, price is not None)
+        if price:
+            break
+    check_drift("Amazon", "price", AMAZON_PRICE_SELECTORS[0])
+
+    if not name or not price:
+        name, price = structural_fallback("Amazon", soup, name, price)
+    
+    if not name or not price:
+        return None, None, "Amazon"
+        
+    return name, price, "Amazon"
+
+@timed("extract_flipkart")
+def fetch_flipkart_details(soup):
+    # Try multiple selectors for product name on Flipkart, best recent hit rate first
+    name = None
+    for selector in ordered("Flipkart", "name", FLIPKART_NAME_SELECTORS):
+        element = soup.find("span", selector)
+        if not element:
+            element = soup.find("h1", selector)
+        record("Flipkart", "name", selector, element is not None)
+        if element:
+            name = element.get_text(strip=True)
+            break
+    check_drift("Flipkart", "name", FLIPKART_NAME_SELECTORS[0])
+    
+    # Try multiple selectors for price on Flipkart
+    price = None
+    for selector in ordered("Flipkart", "price", FLIPKART_PRICE_SELECTORS):
+        element = soup.find("div", selector)
+        if element:
+            price = parse_price(element.get_text(strip=True))
+        record("Flipkart", "price", selector, price is not None)
+        if price:
+            break
+    check_drift("Flipkart", "price", FLIPKART_PRICE_SELECTORS[0])
+
+    if not name or not price:
+        name, price = structural_fallback("Flipkart", soup, name, price)
+    
+    if not name or not price:
+        return None, None, "Flipkart"
+        
+    return name, price, "Flipkart"
+
+##############################
+# STRUCTURAL FALLBACKS
+##############################
+def json_ld_fallback(soup):
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            product = find_json_ld_product(json.loads(script.string or ""))
+        except ValueError:
+            continue
+        if product:
+            return json_ld_name_price(product)
+    return None, None
+
+def meta_fallback(soup):
+    name = price = None
+    title = soup.find("meta", property="og:title")
+    if title and title.get("content"):
+        name = title["content"].strip()
+    for attrs in [{"property": "product:price:amount"}, {"property": "og:price:amount"}, {"itemprop": "price"}]:
+        element = soup.find("meta", attrs)
+        if element and element.get("content"):
+            price = parse_price(element["content"])
+            if price:
+                break
+    return name, price
+
+def rupee_regex_fallback(soup, name):
+    # Take the first rupee amount that follows the title in the page text
+    text = soup.get_text(" ")
+    start = text.find(name[:40]) if name else -1
+    window = text[start:start + PRICE_SEARCH_WINDOW] if start >= 0 else text
+    match = RUPEE_PRICE_PATTERN.search(window)
+    return parse_price(match.group(1)) if match else None
+
+def structural_fallback(platform, soup, name, price):
+    # Cheap structural heuristics for when every class selector misses (e.g. during a redesign)
+    with timer("structural_fallback", platform=platform):
+        for source, fallback in [("json_ld", json_ld_fallback), ("meta", meta_fallback)]:
+            found_name, found_price = fallback(soup)
+            if not name:
+                record(platform, "name", source, bool(found_name))
+                name = found_name
+            if not price:
+                record(platform, "price", source, bool(found_price))
+                price = found_price
+            if name and price:
+                return name, price
+        if not price:
+            price = rupee_regex_fallback(soup, name)
+            record(platform, "price", "rupee_regex", price is not None)
+    return name, price
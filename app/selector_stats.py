@@ -0,0 +1,170 @@
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+from metrics import inc, set_gauge
+from product_store import locked_json, read_json
+
+# File to persist learned selector hit rates across restarts
+SELECTOR_STATS_FILE = "selector_stats.json"
+
+# Rolling window of outcomes kept per selector
+WINDOW = 50
+
+# Alert when the primary selector hits less than DRIFT_THRESHOLD of its last MIN_SAMPLES+ attempts
+DRIFT_THRESHOLD = 0.5
+MIN_SAMPLES = 10
+
+# Chance of trying selectors in their original order, so a recovered primary can win back its place
+EXPLORE_RATE = 0.05
+
+SAVE_INTERVAL_SECONDS = 30
+
+_lock = threading.Lock()
+_stats = None
+_stats_path = None
+_pending = {}
+_alerts = {}
+_last_save = 0.0
+_capture = None
+
+
+def selector_key(selector):
+    # Stable name for a selector dict, e.g. {"class": "Nx9bqj"} -> "class=Nx9bqj"
+    if isinstance(selector, str):
+        return selector
+    return ",".join(f"{k}={v}" for k, v in sorted(selector.items()))
+
+
+def _load(path=SELECTOR_STATS_FILE):
+    global _stats, _stats_path
+    if _stats is None or _stats_path != path:
+        _stats = {key: deque(outcomes, maxlen=WINDOW) for key, outcomes in read_json(path).items()}
+        _stats_path = path
+        _pending.clear()
+    return _stats
+
+
+def _save(path=SELECTOR_STATS_FILE):
+    # Merge outcomes recorded since the last save into the file's current windows under its lock,
+    # so other processes' outcomes are kept, then pick up the merged windows
+    global _stats, _last_save
+    if not _pending or time.time() - _last_save < SAVE_INTERVAL_SECONDS:
+        return
+    _last_save = time.time()
+    with locked_json(path, indent=None) as stored:
+        for key, outcomes in _pending.items():
+            stored[key] = (stored.get(key, []) + list(outcomes))[-WINDOW:]
+        _stats = {key: deque(outcomes, maxlen=WINDOW) for key, outcomes in stored.items()}
+    _pending.clear()
+
+
+def _stat_key(platform, field, selector):
+    return f"{platform}|{field}|{selector_key(selector)}"
+
+
+def hit_rate(platform, field, selector):
+    with _lock:
+        outcomes = _load().get(_stat_key(platform, field, selector))
+        if not outcomes:
+            return None, 0
+        return sum(outcomes) / len(outcomes), len(outcomes)
+
+
+def record(platform, field, selector, hit):
+    key = selector_key(selector)
+    with _lock:
+        if _capture is not None:
+            _capture.append(("record", platform, field, selector, hit))
+        stat_key = _stat_key(platform, field, selector)
+        _load().setdefault(stat_key, deque(maxlen=WINDOW)).append(1 if hit else 0)
+        _pending.setdefault(stat_key, deque(maxlen=WINDOW)).append(1 if hit else 0)
+        _save()
+    inc("selector_attempts_total", platform=platform, field=field, selector=key, result="hit" if hit else "miss")
+
+
+def ordered(platform, field, selectors):
+    # Try selectors with the best recent hit rate first. Selectors with fewer than MIN_SAMPLES
+    # outcomes keep their original rank, so one stray miss doesn't demote the primary selector.
+    if random.random() < EXPLORE_RATE:
+        return list(selectors)
+
+    def rank(indexed):
+        index, selector = indexed
+        rate, samples = hit_rate(platform, field, selector)
+        return (-(rate if samples >= MIN_SAMPLES else 1.0), index)
+
+    return [selector for _, selector in sorted(enumerate(selectors), key=rank)]
+
+
+def check_drift(platform, field, primary):
+    # Raise (or clear) a drift alert when the primary selector's hit rate collapses
+    rate, samples = hit_rate(platform, field, primary)
+    alert_key = f"{platform}|{field}"
+    drifting = samples >= MIN_SAMPLES and rate < DRIFT_THRESHOLD
+    set_gauge("selector_drift", 1 if drifting else 0, platform=platform, field=field)
+    with _lock:
+        if _capture is not None:
+            _capture.append(("drift", platform, field, primary))
+        if drifting and alert_key not in _alerts:
+            _alerts[alert_key] = {
+                "platform": platform,
+                "field": field,
+                "selector": selector_key(primary),
+                "hit_rate": round(rate, 2),
+                "since": time.strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            print(f"Selector Drift Alert: {platform} {field} selector '{selector_key(primary)}' "
+                  f"hit rate dropped to {rate:.0%} over {samples} attempts", file=sys.stderr)
+        elif not drifting and alert_key in _alerts:
+            del _alerts[alert_key]
+    return drifting
+
+
+def drift_alerts():
+    with _lock:
+        return list(_alerts.values())
+
+
+def summary():
+    with _lock:
+        rows = []
+        for key, outcomes in sorted(_load().items()):
+            platform, field, selector = key.split("|", 2)
+            rows.append({
+                "platform": platform,
+                "field": field,
+                "selector": selector,
+                "hit_rate": round(sum(outcomes) / len(outcomes), 2) if outcomes else None,
+                "samples": len(outcomes),
+            })
+        return rows
+
+
+##############################
+# PARSE PROCESSES
+##############################
+def start_capture():
+    # In a parse process: also keep every outcome and drift check so the parent can replay them
+    global _capture
+    with _lock:
+        if _capture is None:
+            _capture = []
+
+
+def drain_capture():
+    global _capture
+    with _lock:
+        events, _capture = _capture or [], ([] if _capture is not None else None)
+    return events
+
+
+def replay(events):
+    # Apply outcomes recorded in a parse process to this process's stats and drift alerts
+    for event in events:
+        if event[0] == "record":
+            record(*event[1:])
+        else:
+            check_drift(*event[1:])
@@ -0,0 +1,184 @@
+import argparse
+import ast
+import itertools
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from metrics import timer
+from product_store import DATA_FILE, load_tracked_products
+from retention import full_history
+
+# Replays stored price histories for every product through alternative alert / auto-purchase
+# strategies and reports alerts fired and savings captured. All products are packed into one
+# flat price array with per-product offsets, so each strategy is a handful of numpy operations
+# over the whole catalog and parameter grids can be swept quickly.
+#
+#   python simulator.py --strategy all --top 5
+#   python simulator.py --strategy below_avg --db products.db
+
+# Processes fitting anomaly models; defaults to one per core
+PROCESSES = int(os.environ.get("SIMULATOR_PROCESSES", os.cpu_count() or 1))
+
+# Default parameter grids swept per strategy
+GRIDS = {
+    # Alert when the price is drop_pct% below the product's first recorded price
+    "threshold": {"drop_pct": [5, 10, 15, 20, 30]},
+    # Alert when the price is pct% below the average of the previous `window` readings
+    "below_avg": {"window": [5, 10, 20, 50], "pct": [5, 10, 15, 20]},
+    # Alert on readings detect_anomalies() flags as outliers below the product's median price. Like
+    # main.py, the model sees each product's whole history, so this strategy has hindsight.
+    "anomaly": {"contamination": [0.05, 0.1, 0.2]},
+}
+
+
+##############################
+# HISTORIES
+##############################
+def load_histories(path=DATA_FILE, db=None):
+    # url -> [price, ...] in time order, from the JSON store and optionally main.py's products.db
+    histories = {url: [price for _, _, price in full_history(details)]
+                 for url, details in load_tracked_products(path).items()}
+    if db:
+        conn = sqlite3.connect(db)
+        for url, _, prices in conn.execute("SELECT url, name, prices FROM tracked_products"):
+            try:
+                # main.py stores str() of a list of (timestamp, price) tuples; inf isn't a literal
+                points = ast.literal_eval(re.sub(r'\binf\b', '1e999', prices))
+            except (ValueError, SyntaxError) as e:
+                print(f"Error parsing prices for {url}: {e}", file=sys.stderr)
+                continue
+            # main.py stores inf for readings without a price
+            histories.setdefault(url, [float(price) for _, price in points if float(price) != float('inf')])
+        conn.close()
+    return {url: prices for url, prices in histories.items() if prices}
+
+
+class Catalog:
+    # Every product's history concatenated into one array; `seg` maps each point to its product
+    def __init__(self, histories, processes=PROCESSES):
+        self.urls = list(histories)
+        self.lengths = np.array([len(histories[url]) for url in self.urls], dtype=np.int64)
+        self.starts = np.concatenate(([0], np.cumsum(self.lengths)[:-1])).astype(np.int64)
+        self.prices = np.fromiter(itertools.chain.from_iterable(histories[url] for url in self.urls),
+                                  dtype=np.float64, count=int(self.lengths.sum()))
+        self.seg = np.repeat(np.arange(len(self.urls)), self.lengths)
+        self.first = np.zeros(len(self.prices), dtype=bool)
+        self.first[self.starts] = True
+        self.mean = np.add.reduceat(self.prices, self.starts) / self.lengths
+        self.low = np.minimum.reduceat(self.prices, self.starts)
+        self.processes = processes
+        self._scores = None
+
+    def __len__(self):
+        return len(self.urls)
+
+    def prior_mean(self, window):
+        # Mean of up to `window` previous readings of the same product (NaN for a first reading)
+        index = np.arange(len(self.prices))
+        lo = np.maximum(index - window, self.starts[self.seg])
+        count = index - lo
+        sums = np.concatenate(([0.0], np.cumsum(self.prices)))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 0, (sums[index] - sums[lo]) / count, np.nan)
+
+    def anomalies(self, contamination):
+        # Same rule as detect_anomalies(): points scoring below the contamination percentile of
+        # their product. IsolationForest is fitted once per product (on a process pool) and the
+        # scores are reused for every contamination level in a sweep.
+        if self._scores is None:
+            from analytics import anomaly_scores
+
+            self._scores = np.full(len(self.prices), np.inf)
+            fit = [(start, length) for start, length in zip(self.starts, self.lengths)
+                   if length > 1 and self.prices[start:start + length].min() != self.prices[start:start + length].max()]
+            with ProcessPoolExecutor(max_workers=self.processes) as pool:
+                segments = (self.prices[start:start + length].tolist() for start, length in fit)
+                for (start, length), scores in zip(fit, pool.map(anomaly_scores, segments, chunksize=16)):
+                    self._scores[start:start + length] = scores
+        flags = np.zeros(len(self.prices), dtype=bool)
+        for start, length in zip(self.starts, self.lengths):
+            scores = self._scores[start:start + length]
+            if np.isfinite(scores[0]):
+                flags[start:start + length] = scores < np.percentile(scores, 100 * contamination)
+        return flags
+
+
+##############################
+# STRATEGIES
+##############################
+def threshold_signal(catalog, drop_pct):
+    return catalog.prices <= catalog.prices[catalog.starts][catalog.seg] * (1 - drop_pct / 100)
+
+
+def below_avg_signal(catalog, window, pct):
+    with np.errstate(invalid="ignore"):
+        return catalog.prices <= catalog.prior_mean(window) * (1 - pct / 100)
+
+
+def anomaly_signal(catalog, contamination):
+    medians = np.array([np.median(catalog.prices[s:s + n]) for s, n in zip(catalog.starts, catalog.lengths)])
+    return catalog.anomalies(contamination) & (catalog.prices < medians[catalog.seg])
+
+
+STRATEGIES = {"threshold": threshold_signal, "below_avg": below_avg_signal, "anomaly": anomaly_signal}
+
+
+def evaluate(catalog, signal):
+    # An alert fires when the condition turns true; the first alert per product is the purchase.
+    # Savings are measured against the product's average price over the replayed history.
+    previous = np.concatenate(([False], signal[:-1]))
+    alerts = signal & ~(previous & ~catalog.first)
+    alert_index = np.flatnonzero(alerts)
+    bought, first_alert = np.unique(catalog.seg[alert_index], return_index=True)
+    paid = catalog.prices[alert_index[first_alert]]
+    savings = catalog.mean[bought] - paid
+    best = catalog.mean[bought] - catalog.low[bought]
+    spend = catalog.mean[bought].sum()
+    return {
+        "alerts": int(alerts.sum()),
+        "products_alerted": int(len(bought)),
+        "savings": round(float(savings.sum()), 2),
+        "savings_pct": round(float(savings.sum() / spend * 100), 2) if spend else 0.0,
+        "capture_pct": round(float(savings.sum() / best.sum() * 100), 2) if best.sum() else 0.0,
+    }
+
+
+def sweep(catalog, strategy, grid=None):
+    # Evaluate every parameter combination; best savings first
+    grid = grid or GRIDS[strategy]
+    names = list(grid)
+    results = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(zip(names, values))
+        with timer("simulate", strategy=strategy):
+            start = time.perf_counter()
+            result = evaluate(catalog, STRATEGIES[strategy](catalog, **params))
+        results.append(dict(result, strategy=strategy, params=params,
+                            elapsed_ms=round((time.perf_counter() - start) * 1000, 2)))
+    return sorted(results, key=lambda r: r["savings"], reverse=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay price histories through alert / purchase strategies")
+    parser.add_argument("--strategy", choices=list(STRATEGIES) + ["all"], default="all")
+    parser.add_argument("--data-file", default=DATA_FILE, help="tracked products JSON file")
+    parser.add_argument("--db", help="also replay histories from main.py's products.db")
+    parser.add_argument("--top", type=int, default=5, help="best parameter sets shown per strategy")
+    parser.add_argument("--processes", type=int, default=PROCESSES, help="processes fitting anomaly models")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    catalog = Catalog(load_histories(args.data_file, args.db), args.processes)
+    print(f"Loaded {len(catalog)} products, {len(catalog.prices)} points in {time.perf_counter() - start:.2f}s")
+    if not len(catalog):
+        raise SystemExit(0)
+    for strategy in (STRATEGIES if args.strategy == "all" else [args.strategy]):
+        for result in sweep(catalog, strategy)[:args.top]:
+            print(json.dumps(result))
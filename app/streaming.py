@@ -0,0 +1,138 @@
+import codecs
+import threading
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+
+from metrics import inc, timer
+from structured_data import SCRIPT_END, extract_structured, parse_price
+
+CHUNK_SIZE = 16 * 1024
+
+# Fields sniffed from the HTML stream: field -> [(tags, attribute, value), ...]
+STREAM_TARGETS = {
+    "Amazon": {
+        "name": [(("span",), "id", "productTitle")],
+        "price": [(("span",), "class", "a-price-whole")],
+        "price_fraction": [(("span",), "class", "a-price-fraction")],
+    },
+    "Flipkart": {
+        "name": [(("span", "h1"), "class", "VU-ZEz"), (("span", "h1"), "class", "B_NuCI")],
+        "price": [(("div",), "class", "Nx9bqj"), (("div",), "class", "_30jeq3")],
+    },
+}
+
+
+# Per-domain running average of full page sizes (bytes on the wire) from reads that didn't stop
+# early, used to estimate the bytes saved when a chunked response has no Content-Length
+_page_sizes = {}
+_page_sizes_lock = threading.Lock()
+
+
+def _observe_page_size(domain, size):
+    with _page_sizes_lock:
+        count, average = _page_sizes.get(domain, (0, 0.0))
+        _page_sizes[domain] = (count + 1, average + (size - average) / (count + 1))
+
+
+def typical_page_size(domain):
+    with _page_sizes_lock:
+        count, average = _page_sizes.get(domain, (0, 0.0))
+    return average if count else None
+
+
+class FieldSniffer(HTMLParser):
+    # Incremental parser that captures the text of the first element matching each target field
+    def __init__(self, targets):
+        super().__init__(convert_charrefs=True)
+        self.targets = targets
+        self.found = {}
+        self._capture = None
+
+    def _matches(self, tag, attrs, spec):
+        tags, attr, value = spec
+        if tag not in tags:
+            return False
+        actual = attrs.get(attr) or ""
+        return value in actual.split() if attr == "class" else actual == value
+
+    def handle_starttag(self, tag, attrs):
+        if self._capture:
+            if tag == self._capture["tag"]:
+                self._capture["depth"] += 1
+            return
+        attrs = dict(attrs)
+        for field, specs in self.targets.items():
+            if field not in self.found and any(self._matches(tag, attrs, spec) for spec in specs):
+                self._capture = {"field": field, "tag": tag, "depth": 1, "parts": []}
+                return
+
+    def handle_data(self, data):
+        if self._capture:
+            self._capture["parts"].append(data)
+
+    def handle_endtag(self, tag):
+        if not self._capture or tag != self._capture["tag"]:
+            return
+        self._capture["depth"] -= 1
+        if self._capture["depth"] == 0:
+            text = "".join(self._capture["parts"]).strip()
+            if text:
+                self.found[self._capture["field"]] = text
+            self._capture = None
+
+    def complete(self):
+        return all(field in self.found for field in self.targets)
+
+    def name_price(self):
+        price_text = self.found.get("price")
+        if price_text and "price_fraction" in self.found:
+            price_text = price_text.rstrip(".") + "." + self.found["price_fraction"]
+        return self.found.get("name"), parse_price(price_text)
+
+
+def read_streaming(response, platform):
+    # Read the body chunk by chunk and stop as soon as name and price are known. Returns
+    # (name, price, content, early); content is the full body whenever early is False.
+    sniffer = FieldSniffer(STREAM_TARGETS.get(platform, {}))
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    buffer = bytearray()
+    name = price = None
+    scanned = 0
+    domain = urlparse(response.url).netloc
+
+    with timer("stream_read", platform=platform):
+        for chunk in response.iter_content(CHUNK_SIZE):
+            buffer.extend(chunk)
+            # Structured data can only complete once another </script> has arrived
+            if buffer.find(SCRIPT_END, max(0, scanned - len(SCRIPT_END))) >= 0:
+                name, price = extract_structured(bytes(buffer), platform)
+                if name and price:
+                    break
+            scanned = len(buffer)
+            sniffer.feed(decoder.decode(chunk))
+            if sniffer.complete():
+                name, price = sniffer.name_price()
+                if name and price:
+                    break
+        else:
+            name = price = None
+
+    early = bool(name and price)
+    wire_bytes = response.raw.tell() if hasattr(response.raw, "tell") else len(buffer)
+    response.close()
+
+    inc("stream_bytes_read_total", wire_bytes, domain=domain)
+    content_length = response.headers.get("Content-Length")
+    full_size = int(content_length) if content_length and content_length.isdigit() else None
+    if not early:
+        _observe_page_size(domain, wire_bytes)
+    else:
+        inc("stream_early_exits_total", domain=domain)
+        if full_size is not None:
+            _observe_page_size(domain, full_size)
+        else:
+            # Chunked responses carry no Content-Length; estimate from this domain's full reads
+            full_size = typical_page_size(domain)
+        if full_size is not None:
+            inc("stream_bytes_saved_total", max(0, int(full_size - wire_bytes)), domain=domain)
+    return name, price, bytes(buffer), early
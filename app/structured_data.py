@@ -0,0 +1,138 @@
+import json
+import re
+from decimal import Decimal, InvalidOperation
+
+# Markers scanned for directly in the raw response bytes
+LD_JSON_MARKER = b"application/ld+json"
+INITIAL_STATE_MARKER = b"window.__INITIAL_STATE__"
+SCRIPT_END = b"</script>"
+
+PRICE_NUMBER_PATTERN = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+
+def parse_price(value):
+    # Parse "₹1,299.00", "1299" or 1299.5 exactly via Decimal (no paise guessing)
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = PRICE_NUMBER_PATTERN.search(str(value))
+    if not match:
+        return None
+    try:
+        return float(Decimal(match.group().replace(",", "")))
+    except InvalidOperation:
+        return None
+
+
+##############################
+# JSON-LD
+##############################
+def iter_json_ld(content):
+    # Yield each decoded <script type="application/ld+json"> blob without parsing the page
+    pos = 0
+    while True:
+        marker = content.find(LD_JSON_MARKER, pos)
+        if marker < 0:
+            return
+        start = content.find(b">", marker)
+        end = content.find(SCRIPT_END, start) if start >= 0 else -1
+        if end < 0:
+            return
+        try:
+            yield json.loads(content[start + 1:end])
+        except ValueError:
+            pass
+        pos = end
+
+
+def find_json_ld_product(data):
+    # Find the schema.org Product node in a decoded JSON-LD blob
+    if isinstance(data, list):
+        for item in data:
+            product = find_json_ld_product(item)
+            if product:
+                return product
+    elif isinstance(data, dict):
+        types = data.get("@type")
+        if "Product" in (types if isinstance(types, list) else [types]):
+            return data
+        if "@graph" in data:
+            return find_json_ld_product(data["@graph"])
+    return None
+
+
+def json_ld_name_price(product):
+    offers = product.get("offers") or {}
+    if isinstance(offers, list):
+        offers = offers[0] if offers else {}
+    price = offers.get("price") if offers.get("price") is not None else offers.get("lowPrice")
+    return product.get("name"), parse_price(price)
+
+
+def scan_json_ld(content):
+    for data in iter_json_ld(content):
+        product = find_json_ld_product(data)
+        if product:
+            return json_ld_name_price(product)
+    return None, None
+
+
+##############################
+# EMBEDDED STATE (Flipkart)
+##############################
+def scan_initial_state(content):
+    # Decode only the window.__INITIAL_STATE__ object from the raw page bytes
+    marker = content.find(INITIAL_STATE_MARKER)
+    if marker < 0:
+        return None
+    start = content.find(b"{", marker)
+    end = content.find(SCRIPT_END, start) if start >= 0 else -1
+    if end < 0:
+        return None
+    try:
+        state, _ = json.JSONDecoder().raw_decode(content[start:end].decode("utf-8", errors="replace"))
+    except ValueError:
+        return None
+    return state
+
+
+def _walk_dicts(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            yield node
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+
+
+def initial_state_name_price(state):
+    name = price = None
+    for node in _walk_dicts(state):
+        final_price = node.get("finalPrice")
+        if price is None and isinstance(final_price, dict) and final_price.get("value") is not None:
+            price = parse_price(final_price["value"])
+        titles = node.get("titles")
+        if name is None and isinstance(titles, dict) and titles.get("title"):
+            name = titles["title"]
+        if name and price:
+            break
+    return name, price
+
+
+##############################
+# FAST PATH
+##############################
+def extract_structured(content, platform):
+    # Pull (name, price) from embedded structured data; (None, None) means fall back to the DOM
+    name, price = scan_json_ld(content)
+    if name and price:
+        return name, price
+    if platform == "Flipkart":
+        state = scan_initial_state(content)
+        if state is not None:
+            state_name, state_price = initial_state_name_price(state)
+            return name or state_name, price or state_price
+    return name, price
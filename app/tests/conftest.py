@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+# The app modules import each other as top-level modules, the way the Streamlit scripts run them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def _in_tmp_path(tmp_path, monkeypatch):
+    # Stores default to files in the working directory (events.db, retry_queue.json, ...)
+    monkeypatch.chdir(tmp_path)
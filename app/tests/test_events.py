@@ -0,0 +1,71 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+import events
+
+
+@pytest.fixture
+def receiver():
+    receiver = events.LocalWebhookReceiver().start()
+    yield receiver
+    receiver.stop()
+
+
+def _event(i):
+    return {"type": "price_drop", "url": f"https://www.amazon.in/dp/{i}", "old_price": 100, "new_price": 90}
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def test_next_batch_splits_at_max_size():
+    subscriber = events.stream.subscribe()
+    try:
+        for i in range(5):
+            events.stream.publish(_event(i))
+        first = events.next_batch(subscriber, max_size=3, linger=0.1)
+        second = events.next_batch(subscriber, max_size=3, linger=0.1)
+        assert [e["url"][-1] for e in first] == ["0", "1", "2"]
+        assert [e["url"][-1] for e in second] == ["3", "4"]
+        assert events.next_batch(subscriber, max_size=3, first_wait=0.05, linger=0.05) == []
+    finally:
+        events.stream.unsubscribe(subscriber)
+
+
+def test_deliver_batch_posts_to_receiver(receiver):
+    batch = [_event(1), _event(2)]
+
+    assert events.deliver_batch(receiver.url, batch)
+    assert receiver.batches == [batch]
+
+
+def test_deliver_batch_reports_failure(receiver):
+    url = receiver.url
+    receiver.stop()
+
+    assert not events.deliver_batch(url, [_event(1)])
+
+
+def test_events_logged_by_another_process_reach_the_webhook(receiver, tmp_path, monkeypatch):
+    db = str(tmp_path / "events.db")
+    monkeypatch.setattr(events, "EVENTS_DB", db)
+    monkeypatch.setattr(events, "FLUSH_SECONDS", 0.2)
+    events.start_event_relay(db, poll_seconds=0.05)
+    events.start_webhook_dispatcher([receiver.url])
+
+    script = ("import events\n"
+              "for i, price in enumerate([90, 110, 95]):\n"
+              "    events.publish_price_change(f'https://www.amazon.in/dp/{i}', {'name': 'P'}, 100, price, 'ts')\n"
+              "events.publish_price_change('https://www.amazon.in/dp/x', {'name': 'P'}, 100, 100, 'ts')\n")
+    subprocess.run([sys.executable, "-c", script], check=True, env={"EVENTS_DB": db, "PYTHONPATH": ":".join(sys.path)})
+
+    assert _wait_for(lambda: sum(len(batch) for batch in receiver.batches) == 3)
+    delivered = [event for batch in receiver.batches for event in batch]
+    assert [event["type"] for event in delivered] == ["price_drop", "price_rise", "price_drop"]
@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import product_store
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # Keep the background flusher out of the way; tests flush explicitly
+    monkeypatch.setattr(product_store, "FLUSH_INTERVAL_SECONDS", 3600)
+    path = tmp_path / "tracked_products.json"
+    product_store.save_tracked_products({}, str(path))
+    return path
+
+
+def test_flush_writes_queued_readings(store):
+    buffer = product_store.WriteBehindBuffer(str(store))
+    buffer.add("https://www.amazon.in/dp/A", "A", 100.0, "Amazon", "2024-01-01 00:00:00")
+    buffer.add("https://www.amazon.in/dp/A", "A", 90.0, "Amazon", "2024-01-02 00:00:00")
+
+    changes = buffer.flush()
+
+    assert [change[2:4] for change in changes] == [(100.0, 90.0)]
+    assert list(json.loads(store.read_text())) == ["https://www.amazon.in/dp/A"]
+    assert buffer.pending == []
+
+
+def test_failed_flush_keeps_readings_and_removes_temp_file(store, monkeypatch):
+    buffer = product_store.WriteBehindBuffer(str(store))
+    buffer.add("https://www.amazon.in/dp/A", "A", 100.0, "Amazon", "2024-01-01 00:00:00")
+    original = store.read_text()
+
+    def failing_dump(*args, **kwargs):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(product_store.json, "dump", failing_dump)
+        buffer.add("https://www.amazon.in/dp/B", "B", 50.0, "Amazon", "2024-01-01 00:00:00")
+        with pytest.raises(OSError):
+            buffer.flush()
+
+    assert store.read_text() == original
+    assert [name for name in os.listdir(store.parent) if name.endswith(".tmp")] == []
+    assert [reading[0][-1] for reading in buffer.pending] == ["A", "B"]
+
+    buffer.flush()
+    assert sorted(json.loads(store.read_text())) == ["https://www.amazon.in/dp/A", "https://www.amazon.in/dp/B"]
+
+
+def test_concurrent_flushes_from_processes_keep_every_reading(store):
+    # Each process flushes its readings in small batches; without the file lock, read-modify-write
+    # races between them would drop products
+    script = (
+        "import sys, product_store\n"
+        "worker, path = sys.argv[1], sys.argv[2]\n"
+        "buffer = product_store.WriteBehindBuffer(path)\n"
+        "for i in range(40):\n"
+        "    buffer.add(f'https://www.amazon.in/dp/{worker}-{i}', 'P', 100.0, 'Amazon', '2024-01-01 00:00:00')\n"
+        "    if i % 5 == 4:\n"
+        "        buffer.flush()\n"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path), STORE_FLUSH_SECONDS="3600")
+    workers = [subprocess.Popen([sys.executable, "-c", script, str(worker), str(store)], env=env)
+               for worker in range(4)]
+    assert [worker.wait(timeout=60) for worker in workers] == [0, 0, 0, 0]
+
+    assert len(json.loads(store.read_text())) == 4 * 40
+
+
+def test_flush_compacts_raw_records(store):
+    raw = {"name": "A", "platform": "Amazon",
+           "prices": [["2024-01-01 00:00:00", 100.0], ["2024-01-02 00:00:00", 100.0]]}
+    product_store.save_tracked_products({"https://www.amazon.in/dp/A": raw}, str(store))
+    buffer = product_store.WriteBehindBuffer(str(store))
+    for day in range(3, 7):
+        buffer.add("https://www.amazon.in/dp/A", "A", 100.0, "Amazon", f"2024-01-0{day} 00:00:00")
+
+    buffer.flush()
+
+    details = json.loads(store.read_text())["https://www.amazon.in/dp/A"]
+    assert "prices" not in details
+    assert details["intervals"] == [["2024-01-01 00:00:00", "2024-01-06 00:00:00", 100.0]]
+    assert details["last_checked"] == "2024-01-06 00:00:00"
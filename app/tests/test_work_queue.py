@@ -0,0 +1,63 @@
+import pytest
+
+import work_queue
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = work_queue.init_work_queue(str(tmp_path / "work_queue.db"))
+    yield conn
+    conn.close()
+
+
+def test_claim_leases_each_item_to_one_worker(conn):
+    work_queue.enqueue(conn, ["a", "b", "c"], due_at=100)
+
+    first = work_queue.claim(conn, "worker-1", limit=2, now=200)
+    second = work_queue.claim(conn, "worker-2", limit=2, now=200)
+
+    assert first == ["a", "b"]
+    assert second == ["c"]
+    assert work_queue.claim(conn, "worker-2", now=200) == []
+    assert work_queue.queue_stats(conn, now=200) == {"total": 3, "due": 0, "leased": 3}
+
+
+def test_claim_skips_items_not_due(conn):
+    work_queue.enqueue(conn, ["a"], due_at=300)
+
+    assert work_queue.claim(conn, "worker-1", now=200) == []
+    assert work_queue.claim(conn, "worker-1", now=300) == ["a"]
+
+
+def test_expired_lease_is_claimed_by_another_worker(conn):
+    work_queue.enqueue(conn, ["a"], due_at=100)
+    assert work_queue.claim(conn, "worker-1", lease_seconds=60, now=200) == ["a"]
+
+    assert work_queue.claim(conn, "worker-2", lease_seconds=60, now=250) == []
+    assert work_queue.claim(conn, "worker-2", lease_seconds=60, now=261) == ["a"]
+
+
+def test_complete_and_fail_require_the_current_lease(conn):
+    work_queue.enqueue(conn, ["a", "b"], due_at=100)
+    work_queue.claim(conn, "worker-1", lease_seconds=60, now=200)
+    work_queue.claim(conn, "worker-2", lease_seconds=60, now=300)
+
+    # worker-1's leases expired and were taken over, so its late results are ignored
+    assert not work_queue.complete(conn, "worker-1", "a", next_due=5000)
+    assert not work_queue.fail(conn, "worker-1", "b", retry_at=400)
+
+    assert work_queue.complete(conn, "worker-2", "a", next_due=5000)
+    assert work_queue.fail(conn, "worker-2", "b", retry_at=400)
+    rows = dict((row[0], row[1:]) for row in conn.execute(
+        "SELECT url, due_at, lease_owner, lease_expires, attempts FROM work_items"))
+    assert rows == {"a": (5000, None, None, 0), "b": (400, None, None, 1)}
+
+
+def test_sync_from_store_adds_and_removes_items(conn, tmp_path):
+    path = tmp_path / "tracked_products.json"
+    path.write_text('{"a": {}, "b": {}}')
+    assert work_queue.sync_from_store(conn, str(path)) == 2
+
+    path.write_text('{"b": {}, "c": {}}')
+    assert work_queue.sync_from_store(conn, str(path)) == 1
+    assert sorted(row[0] for row in conn.execute("SELECT url FROM work_items")) == ["b", "c"]
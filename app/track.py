@@ -0,0 +1,199 @@
+import argparse
+import csv
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from price_history import get_prices, last_checked, latest_price
+from product_store import DATA_FILE, load_tracked_products, locked_products
+from retention import full_history
+from scraper import fetch_product_details
+from tracker import save_products, track_product
+from workers import FETCH_THREADS, PARSE_PROCESSES, WRITE_BATCH_SIZE, refresh_products
+
+# Non-interactive batch tool replacing the notebook menus, for cron jobs and scripts:
+#
+#   python track.py add URL [URL ...] [--file urls.txt] [--threshold 999]
+#   python track.py refresh [--threads 16] [--processes 4]
+#   python track.py export [--format csv|json] [--history] [--output products.csv]
+#   python track.py check-drops [--refresh] [--threshold 999] [--json]
+#
+# Progress and throughput go to stderr; results go to stdout.
+
+
+class Progress:
+    # Prints "[done/total] rate" as items finish; rewrites one line on a terminal, and logs
+    # about 20 lines otherwise so cron output stays readable
+    def __init__(self, total, label):
+        self.total = total
+        self.label = label
+        self.done = 0
+        self.results = {}
+        self.start = time.perf_counter()
+        self.tty = sys.stderr.isatty()
+        self.every = max(1, total // 20)
+
+    def __call__(self, url, result):
+        self.done += 1
+        self.results[result] = self.results.get(result, 0) + 1
+        if self.tty or self.done % self.every == 0 or self.done == self.total:
+            elapsed = time.perf_counter() - self.start
+            counts = " ".join(f"{k}={v}" for k, v in sorted(self.results.items()))
+            line = f"{self.label} [{self.done}/{self.total}] {self.done / elapsed:.1f}/s {counts}"
+            print(("\r" + line) if self.tty else line, end="" if self.tty else "\n", file=sys.stderr)
+
+    def finish(self):
+        if self.tty:
+            print(file=sys.stderr)
+        elapsed = time.perf_counter() - self.start
+        print(f"{self.label}: {self.done} in {elapsed:.2f}s ({self.done / elapsed if elapsed else 0:.1f}/s)",
+              file=sys.stderr)
+
+
+def previous_price(details):
+    # Price of the reading before the latest one, so a drop is reported once, not on every run
+    # until the price moves again
+    prices = get_prices(details)
+    return prices[-2][1] if len(prices) > 1 else None
+
+
+##############################
+# COMMANDS
+##############################
+def cmd_add(args):
+    urls = list(args.urls)
+    if args.file:
+        with open(args.file, 'r') as f:
+            urls += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    products = load_tracked_products(args.data_file)
+    progress = Progress(len(urls), "add")
+    added = []
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        futures = {pool.submit(fetch_product_details, url): url for url in urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            name, price, platform = future.result()
+            if not (name and price):
+                progress(url, "failed")
+                continue
+            old_price = track_product(products, url, name, price, platform, path=args.data_file)
+            added.append(url)
+            progress(url, "new" if old_price is None else "updated")
+            print(f"{name}: ₹{price:,.2f}" + (f" (was ₹{old_price:,.2f})" if old_price not in (None, price) else ""))
+    save_products(args.data_file)
+    progress.finish()
+
+    if args.threshold is not None and added:
+        with locked_products(args.data_file) as stored:
+            for url in added:
+                stored[url]['alert_threshold'] = args.threshold
+    return 0 if len(added) == len(urls) else 1
+
+
+def cmd_refresh(args, out=sys.stdout):
+    urls = list(load_tracked_products(args.data_file))
+    progress = Progress(len(urls), "refresh")
+    summary = refresh_products(urls, args.threads, args.processes, args.batch_size, args.data_file, progress)
+    progress.finish()
+    summary.pop("results")
+    print(json.dumps(summary), file=out)
+    return 0 if not summary["failed"] else 1
+
+
+def cmd_export(args):
+    products = load_tracked_products(args.data_file)
+    if args.history:
+        rows = [{"url": url, "name": details['name'], "platform": details.get('platform', 'Unknown'),
+                 "tier": tier, "timestamp": ts, "price": price}
+                for url, details in products.items() for tier, ts, price in full_history(details)]
+    else:
+        rows = [{"url": url, "name": details['name'], "platform": details.get('platform', 'Unknown'),
+                 "price": latest_price(details), "last_checked": last_checked(details),
+                 "alert_threshold": details.get('alert_threshold')}
+                for url, details in products.items()]
+
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            json.dump(rows, out, indent=4)
+            out.write("\n")
+        elif rows:
+            writer = csv.DictWriter(out, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    finally:
+        if args.output:
+            out.close()
+    print(f"export: {len(rows)} rows", file=sys.stderr)
+    return 0
+
+
+def cmd_check_drops(args):
+    before = None
+    if args.refresh:
+        # Compare with the prices from before this refresh; keep stdout for the drop report
+        before = {url: latest_price(details) for url, details in load_tracked_products(args.data_file).items()}
+        cmd_refresh(args, out=sys.stderr)
+    drops = []
+    for url, details in load_tracked_products(args.data_file).items():
+        threshold = args.threshold if args.threshold is not None else details.get('alert_threshold')
+        price = latest_price(details)
+        previous = before.get(url) if before is not None else previous_price(details)
+        if threshold is None or price is None or previous is None:
+            continue
+        if price < threshold and price < previous:
+            drops.append({"url": url, "name": details['name'], "previous_price": previous, "price": price,
+                          "threshold": threshold, "checked": last_checked(details)})
+
+    if args.json:
+        print(json.dumps(drops, indent=4))
+    else:
+        for drop in drops:
+            print(f"Price drop detected for {drop['name']}: ₹{drop['previous_price']:,.2f} → ₹{drop['price']:,.2f} "
+                  f"(threshold ₹{drop['threshold']:,.2f})\n  {drop['url']}")
+    print(f"check-drops: {len(drops)} products below threshold", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="track", description="Batch price tracking for cron jobs and scripts")
+    parser.add_argument("--data-file", default=DATA_FILE, help="tracked products JSON file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="track new products or record a reading for tracked ones")
+    add.add_argument("urls", nargs="*", help="product URLs")
+    add.add_argument("--file", help="file with one URL per line")
+    add.add_argument("--threshold", type=float, help="alert threshold (₹) for the added products")
+    add.add_argument("--threads", type=int, default=FETCH_THREADS, help="concurrent downloads")
+    add.set_defaults(func=cmd_add)
+
+    def refresh_options(command):
+        command.add_argument("--threads", type=int, default=FETCH_THREADS, help="concurrent downloads")
+        command.add_argument("--processes", type=int, default=PARSE_PROCESSES, help="HTML parsing processes")
+        command.add_argument("--batch-size", type=int, default=WRITE_BATCH_SIZE, help="products written per save")
+
+    refresh = commands.add_parser("refresh", help="refresh every tracked product")
+    refresh_options(refresh)
+    refresh.set_defaults(func=cmd_refresh)
+
+    export = commands.add_parser("export", help="export tracked products")
+    export.add_argument("--format", choices=["csv", "json"], default="csv")
+    export.add_argument("--history", action="store_true", help="one row per price point instead of per product")
+    export.add_argument("--output", help="output file (default: stdout)")
+    export.set_defaults(func=cmd_export)
+
+    check = commands.add_parser("check-drops", help="list products that dropped below their alert threshold")
+    check.add_argument("--refresh", action="store_true", help="refresh all products first")
+    check.add_argument("--threshold", type=float, help="override every product's alert threshold (₹)")
+    check.add_argument("--json", action="store_true", help="print drops as JSON")
+    refresh_options(check)
+    check.set_defaults(func=cmd_check_drops)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
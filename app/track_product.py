@@ -1,6 +1,7 @@
 import streamlit as st
 from fetch_amazon import fetch_amazon_product
 from fetch_flipkart import fetch_flipkart_product
+from image_cache import thumbnail
 
 st.title("🔍 Track a New Product")
 
@@ -31,13 +32,13 @@ if st.button("Track Product", type="primary"):
                         st.subheader("📦 Amazon")
                         st.write(f"**Title**: {amazon_result['title']}")
                         st.write(f"**Price**: ₹{amazon_result['price']}")
-                        st.image(amazon_result['image'])
+                        st.image(thumbnail(amazon_result['image']))
 
                     if flipkart_result:
                         st.subheader("🛒 Flipkart")
                         st.write(f"**Title**: {flipkart_result['title']}")
                         st.write(f"**Price**: ₹{flipkart_result['price']}")
-                        st.image(flipkart_result['image'])
+                        st.image(thumbnail(flipkart_result['image']))
 
                 else:
                     st.error("❌ Could not fetch product.")
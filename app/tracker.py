@@ -0,0 +1,90 @@
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+from fetch_strategy import fetch_product_tiered
+from price_history import new_product, record_price, latest_price
+from product_store import DATA_FILE, flush_pending, load_tracked_products, queue_reading
+from retention import query_history
+from retry_queue import run_due_retries
+from scraper import detect_platform
+
+# How often the background job retries failed adds whose backoff has elapsed
+RETRY_INTERVAL_SECONDS = int(os.environ.get("RETRY_INTERVAL_SECONDS", 300))
+
+# Service functions behind the Streamlit pages, kept free of st.* calls so batch jobs and the
+# load-test harness exercise the same code paths as the UI.
+
+
+def track_product(products, url, name, price, platform, timestamp=None, path=DATA_FILE):
+    # Add a product or record a new reading for a tracked one. Returns the previous price
+    # (None for a new product). The session copy is updated immediately; the reading is queued
+    # for the store, which applies it to the latest file contents and publishes the change event.
+    timestamp = timestamp or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    queue_reading(url, name, price, platform, timestamp, path)
+    if url not in products:
+        products[url] = new_product(name, timestamp, price, platform)
+        return None
+    details = products[url]
+    old_price = record_price(details, timestamp, price)
+    if platform != 'Manual':
+        details['platform'] = platform
+    return old_price
+
+
+def save_products(path=DATA_FILE):
+    # Write queued readings now instead of waiting for the background flush
+    flush_pending(path)
+
+
+def list_products(products):
+    return [{'url': url, 'name': details['name'], 'price': latest_price(details),
+             'platform': details.get('platform', 'Unknown')}
+            for url, details in products.items()]
+
+
+def price_trend(products, url, start=None, end=None):
+    return query_history(products[url], start, end)
+
+
+def retry_failed(products=None, path=DATA_FILE, limit=None):
+    # Retry due URLs whose first add failed, so they were never tracked, and add every success.
+    # Tracked products are retried by the refresh workers (work_queue.py reschedules a failed
+    # item at its retry-queue backoff), so they're skipped here rather than fetched twice.
+    # Fetches go through the HTTP/browser tier decision. Returns (results, refreshed).
+    products = {} if products is None else products
+    tracked = set(load_tracked_products(path)) | set(products)
+    results = run_due_retries(fetch_product_tiered, limit=limit, exclude=tracked)
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    refreshed = 0
+    for url, product in results.items():
+        if product and product["title"] and product["price"]:
+            track_product(products, url, product["title"], product["price"], detect_platform(url), timestamp, path)
+            refreshed += 1
+    if refreshed:
+        save_products(path)
+    return results, refreshed
+
+
+_retry_thread = None
+
+
+def start_retry_job(interval=RETRY_INTERVAL_SECONDS, path=DATA_FILE):
+    # Run due retries once per process in the background; Streamlit reruns the script on every interaction
+    global _retry_thread
+    if _retry_thread and _retry_thread.is_alive():
+        return _retry_thread
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                retry_failed(path=path)
+            except Exception as e:
+                print("Retry Job Error:", e, file=sys.stderr)
+
+    _retry_thread = threading.Thread(target=loop, name="retry-job", daemon=True)
+    _retry_thread.start()
+    return _retry_thread
@@ -1,11 +1,20 @@
 import streamlit as st
 import requests
 from bs4 import BeautifulSoup
-from datetime import datetime
+from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 import smtplib
-import json
-import os
+from product_store import load_tracked_products
+from retention import query_history, start_retention_job
+from tracker import track_product, save_products, retry_failed, start_retry_job
+from scraper import fetch_product_details
+from retry_queue import get_entry, list_entries, unpark
+import selector_stats
+from workers import refresh_products
+from events import start_event_server, start_webhook_dispatcher, EVENTS_PORT
+from deals import WINDOWS, top_deals
+from metrics import timer, start_metrics_server, stage_summary, counter_summary, METRICS_PORT
+from price_history import latest_price, convert_products
 
 # Page configuration with custom theme
 st.set_page_config(
@@ -220,142 +229,40 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# File to store tracked products
-DATA_FILE = "tracked_products.json"
-
-# Function to load tracked products from file
-def load_tracked_products():
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
-
 # Function to save tracked products to file
 def save_tracked_products():
-    with open(DATA_FILE, 'w') as f:
-        json.dump(st.session_state.tracked_products, f, indent=4)
+    save_products()
 
 # Initialize session state for tracked products
 if 'tracked_products' not in st.session_state:
-    st.session_state.tracked_products = load_tracked_products()
+    st.session_state.tracked_products = convert_products(load_tracked_products())
 
-# Function to fetch product details from a URL
-def fetch_product_details(url):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Connection": "keep-alive",
-        "Upgrade-Insecure-Requests": "1"
-    }
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.content, "html.parser")
-        
-        # Detect if it's Amazon or Flipkart
-        if "amazon" in url.lower():
-            return fetch_amazon_details(soup)
-        elif "flipkart" in url.lower():
-            return fetch_flipkart_details(soup)
-        else:
-            return None, None, "Unknown"
-            
-    except Exception as e:
-        st.error(f"Error fetching product: {str(e)}")
-        return None, None, "Unknown"
+# Roll up aged price history in the background
+start_retention_job()
 
-def fetch_amazon_details(soup):
-    # Try multiple selectors for product name
-    name = None
-    name_selectors = [
-        {"id": "productTitle"},
-        {"class": "product-title-word-break"},
-        {"id": "title"}
-    ]
-    for selector in name_selectors:
-        element = soup.find("span", selector)
-        if element:
-            name = element.get_text(strip=True)
-            break
-    
-    # Try multiple selectors for price
-    price = None
-    price_selectors = [
-        {"class": "a-price-whole"},
-        {"class": "a-price"},
-        {"class": "priceblock_ourprice"},
-        {"class": "priceblock_dealprice"}
-    ]
-    for selector in price_selectors:
-        element = soup.find("span", selector)
-        if element:
-            price_text = element.get_text(strip=True)
-            # Extract numeric value
-            price_text = price_text.replace("₹", "").replace(",", "").replace(".", "").strip()
-            if price_text and price_text.isdigit():
-                price = float(price_text) / 100  # Convert paise to rupees
-                break
-    
-    if not name or not price:
-        return None, None, "Amazon"
-        
-    return name, price, "Amazon"
+# Retry failed scrapes (including failed adds) once their backoff has elapsed
+start_retry_job()
 
-def fetch_flipkart_details(soup):
-    # Try multiple selectors for product name on Flipkart
-    name = None
-    name_selectors = [
-        {"class": "VU-ZEz"},
-        {"class": "B_NuCI"},
-        {"class": "_35KyD6"}
-    ]
-    for selector in name_selectors:
-        element = soup.find("span", selector)
-        if not element:
-            element = soup.find("h1", selector)
-        if element:
-            name = element.get_text(strip=True)
-            break
-    
-    # Try multiple selectors for price on Flipkart
-    price = None
-    price_selectors = [
-        {"class": "Nx9bqj"},
-        {"class": "_30jeq3"},
-        {"class": "_25b18c"}
-    ]
-    for selector in price_selectors:
-        element = soup.find("div", selector)
-        if element:
-            price_text = element.get_text(strip=True)
-            # Extract numeric value
-            price_text = price_text.replace("₹", "").replace(",", "").strip()
-            try:
-                price = float(price_text)
-                break
-            except:
-                continue
-    
-    if not name or not price:
-        return None, None, "Flipkart"
-        
-    return name, price, "Flipkart"
+# Expose hot-path timings on the local /metrics endpoint, and top-K deal rankings on /deals
+start_metrics_server()
+
+# Stream price change events from this and the worker processes to SSE subscribers on /events,
+# and to WEBHOOK_URLS when configured
+start_event_server()
+start_webhook_dispatcher()
 
 # Function to send an email notification (Simulate purchase confirmation)
 def send_purchase_email(email, product_name, price):
     try:
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login("your_email@gmail.com", "your_password")  # Replace with your email credentials
-        subject = "Purchase Confirmation"
-        body = f"Your product '{product_name}' has been successfully purchased for ₹{price}."
-        message = f"Subject: {subject}\n\n{body}"
-        server.sendmail("your_email@gmail.com", email, message)
-        server.quit()
+        with timer("send_purchase_email"):
+            server = smtplib.SMTP('smtp.gmail.com', 587)
+            server.starttls()
+            server.login("your_email@gmail.com", "your_password")  # Replace with your email credentials
+            subject = "Purchase Confirmation"
+            body = f"Your product '{product_name}' has been successfully purchased for ₹{price}."
+            message = f"Subject: {subject}\n\n{body}"
+            server.sendmail("your_email@gmail.com", email, message)
+            server.quit()
         st.success(f"Purchase confirmation sent to {email}.")
     except Exception as e:
         st.error(f"Failed to send email: {str(e)}")
@@ -368,7 +275,7 @@ st.markdown("<p style='text-align: center; color: #718096; font-size: 1.2rem;'>T
 st.sidebar.markdown("<h2 style='color: white; text-align: center;'>📋 Navigation</h2>", unsafe_allow_html=True)
 option = st.sidebar.selectbox(
     "",
-    ["🏠 Dashboard", "➕ Add/Update Product", "📊 List Tracked Products", "📈 Visualize Price Trend", "⚖️ Compare Prices"]
+    ["🏠 Dashboard", "➕ Add/Update Product", "📊 List Tracked Products", "📈 Visualize Price Trend", "⚖️ Compare Prices", "🔥 Top Deals", "🛠️ Admin Metrics"]
 )
 
 # Dashboard
@@ -419,7 +326,7 @@ if option == "🏠 Dashboard":
             st.markdown(f"""
                 <div class="product-card">
                     <h4>{details['name'][:60]}...</h4>
-                    <p style="font-size: 1.5rem; color: #667eea; font-weight: 700;">₹{details['prices'][-1][1]:,.2f}</p>
+                    <p style="font-size: 1.5rem; color: #667eea; font-weight: 700;">₹{latest_price(details):,.2f}</p>
                     <p style="color: #718096;">Platform: {details.get('platform', 'Unknown')}</p>
                 </div>
             """, unsafe_allow_html=True)
@@ -444,18 +351,16 @@ if option == "➕ Add/Update Product":
         
         if st.button("🚀 Track Product"):
             if url and manual_name and manual_price > 0:
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                if url in st.session_state.tracked_products:
-                    old_price = st.session_state.tracked_products[url]['prices'][-1][1]
+                is_tracked = url in st.session_state.tracked_products
+                old_price = track_product(st.session_state.tracked_products, url, manual_name, manual_price, 'Manual')
+                if is_tracked:
                     if old_price != manual_price:
                         st.info(f"Price updated for {manual_name}: ₹{old_price} → ₹{manual_price}")
-                    st.session_state.tracked_products[url]['prices'].append((timestamp, manual_price))
                     if manual_price <= threshold and threshold > 0:
                         st.success(f"Price for {manual_name} dropped below your threshold of ₹{threshold}. Attempting automatic purchase...")
                         send_purchase_email(email, manual_name, manual_price)
                 else:
                     st.success(f"Adding new product: {manual_name} at ₹{manual_price}")
-                    st.session_state.tracked_products[url] = {'name': manual_name, 'prices': [(timestamp, manual_price)], 'platform': 'Manual'}
                 
                 # Save to file after adding/updating
                 save_tracked_products()
@@ -469,24 +374,29 @@ if option == "➕ Add/Update Product":
                 with st.spinner("🔍 Fetching product details..."):
                     name, price, platform = fetch_product_details(url)
                 if name and price:
-                    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    if url in st.session_state.tracked_products:
-                        old_price = st.session_state.tracked_products[url]['prices'][-1][1]
+                    is_tracked = url in st.session_state.tracked_products
+                    old_price = track_product(st.session_state.tracked_products, url, name, price, platform)
+                    if is_tracked:
                         if old_price != price:
                             st.info(f"Price updated for {name}: ₹{old_price} → ₹{price}")
-                        st.session_state.tracked_products[url]['prices'].append((timestamp, price))
-                        st.session_state.tracked_products[url]['platform'] = platform
                         if price <= threshold and threshold > 0:
                             st.success(f"Price for {name} dropped below your threshold of ₹{threshold}. Attempting automatic purchase...")
                             send_purchase_email(email, name, price)
                     else:
                         st.success(f"✅ Adding new product: {name} at ₹{price} from {platform}")
-                        st.session_state.tracked_products[url] = {'name': name, 'prices': [(timestamp, price)], 'platform': platform}
                     
                     # Save to file after adding/updating
                     save_tracked_products()
                 else:
-                    st.error("Failed to fetch product details. Check the URL or try manual entry option above.")
+                    failure = get_entry(url)
+                    if failure:
+                        st.error(f"Failed to fetch product details ({failure['kind'].replace('_', ' ')}: {failure['message']}). Check the URL or try manual entry option above.")
+                        if failure['parked']:
+                            st.caption("Automatic retries for this URL have stopped; it will be retried once the scraper is fixed.")
+                        else:
+                            st.caption(f"Queued for automatic retry at {datetime.fromtimestamp(failure['next_attempt']).strftime('%Y-%m-%d %H:%M:%S')}.")
+                    else:
+                        st.error("Failed to fetch product details. Check the URL or try manual entry option above.")
 
 elif option == "📊 List Tracked Products":
     st.markdown("### 📊 Tracked Products")
@@ -496,7 +406,7 @@ elif option == "📊 List Tracked Products":
             st.markdown(f"""
                 <div class="product-card">
                     <h4>{platform_emoji} {details['name']}</h4>
-                    <p style="font-size: 1.8rem; color: #667eea; font-weight: 700;">₹{details['prices'][-1][1]:,.2f}</p>
+                    <p style="font-size: 1.8rem; color: #667eea; font-weight: 700;">₹{latest_price(details):,.2f}</p>
                     <p style="color: #718096;">Latest Price • Platform: {details.get('platform', 'Unknown')}</p>
                     <a href="{url}" target="_blank" style="color: #667eea; text-decoration: none; font-weight: 600;">🔗 View Product</a>
                 </div>
@@ -512,6 +422,8 @@ elif option == "📈 Visualize Price Trend":
         product_urls = list(st.session_state.tracked_products.keys())
         
         selected_product_name = st.selectbox("📦 Select a product to visualize:", ["Select the product"] + product_names)
+        trend_ranges = {"Last 24 hours": 1, "Last 7 days": 7, "Last 30 days": 30, "Last 90 days": 90, "All time": None}
+        selected_range = st.selectbox("🗓️ Select a time range:", list(trend_ranges.keys()), index=1)
         
         if st.button("📊 Show Trend"):
             if selected_product_name == "Select the product":
@@ -526,7 +438,13 @@ elif option == "📈 Visualize Price Trend":
                 
                 if selected_url:
                     product = st.session_state.tracked_products[selected_url]
-                    timestamps, prices = zip(*product['prices'])
+                    days = trend_ranges[selected_range]
+                    start = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S') if days else None
+                    tier, points = query_history(product, start)
+                    if not points:
+                        st.warning("No price data available for the selected time range.")
+                        st.stop()
+                    timestamps, prices = zip(*points)
                     
                     fig, ax = plt.subplots(figsize=(12, 6))
                     ax.plot(timestamps, prices, marker='o', linewidth=3, markersize=8, 
@@ -540,6 +458,7 @@ elif option == "📈 Visualize Price Trend":
                     plt.xticks(rotation=45, ha='right')
                     plt.tight_layout()
                     st.pyplot(fig)
+                    st.caption(f"Showing {tier} price data for {selected_range.lower()}")
     else:
         st.info("No products are currently being tracked. Add products first to visualize trends.")
 
@@ -572,7 +491,7 @@ elif option == "⚖️ Compare Prices":
                             if details['name'] == selected_product_name:
                                 amazon_url = url
                                 amazon_name = details['name']
-                                amazon_price = details['prices'][-1][1]  # Latest price
+                                amazon_price = latest_price(details)  # Latest price
                                 break
                         
                         if amazon_url:
@@ -619,7 +538,7 @@ elif option == "⚖️ Compare Prices":
                             if details['name'] == selected_product_name:
                                 amazon_url = url
                                 amazon_name = details['name']
-                                amazon_price = details['prices'][-1][1]  # Latest price
+                                amazon_price = latest_price(details)  # Latest price
                                 break
                         
                         if amazon_url:
@@ -708,4 +627,89 @@ elif option == "⚖️ Compare Prices":
         else:
             st.info("No Amazon products found in your tracked products. Please add Amazon products first.")
     else:
-        st.info("No tracked products found. Please add products first in the 'Add/Update Product' section.")
\ No newline at end of file
+        st.info("No tracked products found. Please add products first in the 'Add/Update Product' section.")
+elif option == "🔥 Top Deals":
+    st.markdown("### 🔥 Top Deals")
+    st.caption(f"Deal rankings API: http://localhost:{METRICS_PORT}/deals?metric=drop&window=24h&k=20")
+    deal_metrics = {"📉 Biggest price drops": "drop", "🏷️ At their lowest price": "low", "💸 Furthest below average": "below_avg"}
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        selected_metric = st.selectbox("📊 Rank by:", list(deal_metrics.keys()))
+    with col2:
+        selected_window = st.selectbox("🗓️ Window:", list(WINDOWS.keys()))
+    with col3:
+        top_k = st.number_input("🔢 Show top:", min_value=1, max_value=500, value=20)
+
+    save_tracked_products()
+    deals = top_deals(deal_metrics[selected_metric], selected_window, int(top_k))
+    if deals:
+        for deal in deals:
+            platform_emoji = "🛒" if deal['platform'] == 'Amazon' else "🛍️" if deal['platform'] == 'Flipkart' else "📦"
+            st.markdown(f"""
+                <div class="product-card">
+                    <h4>{platform_emoji} {deal['name']}</h4>
+                    <p style="font-size: 1.8rem; color: #667eea; font-weight: 700;">₹{deal['price']:,.2f}</p>
+                    <p style="color: #718096;">{deal['change_pct']:+.1f}% over {selected_window} • {deal['vs_avg_pct']:+.1f}% vs average ₹{deal['avg']:,.2f} • Low ₹{deal['min']:,.2f} / High ₹{deal['max']:,.2f}</p>
+                    <a href="{deal['url']}" target="_blank" style="color: #667eea; text-decoration: none; font-weight: 600;">🔗 View Product</a>
+                </div>
+            """, unsafe_allow_html=True)
+    else:
+        st.info(f"No deals found for the last {selected_window}. Prices haven't dropped yet!")
+
+elif option == "🛠️ Admin Metrics":
+    st.markdown("### 🛠️ Admin Metrics")
+    st.caption(f"Prometheus endpoint: http://localhost:{METRICS_PORT}/metrics • Price change events (SSE): http://localhost:{EVENTS_PORT}/events • Deals: http://localhost:{METRICS_PORT}/deals")
+
+    stages = stage_summary()
+    if stages:
+        st.markdown("#### ⏱️ Stage Timings")
+        st.dataframe(stages, use_container_width=True)
+    else:
+        st.info("No timings recorded yet. Track a product to start collecting metrics.")
+
+    counters = counter_summary()
+    if counters:
+        st.markdown("#### 🔢 Counters")
+        st.dataframe([{"metric": c["metric"], "labels": ", ".join(f"{k}={v}" for k, v in c["labels"].items()), "value": c["value"]}
+                      for c in counters], use_container_width=True)
+
+    st.markdown("#### 🔄 Bulk Refresh")
+    if st.button("🔄 Refresh All Tracked Products"):
+        with st.spinner("Refreshing all tracked products..."):
+            save_tracked_products()
+            result = refresh_products()
+            st.session_state.tracked_products = convert_products(load_tracked_products())
+        st.success(f"Refreshed {result['refreshed']} of {result['total']} products in {result['elapsed']}s ({result['failed']} failed).")
+
+    st.markdown("#### 🧭 Selector Health")
+    for alert in selector_stats.drift_alerts():
+        st.warning(f"⚠️ {alert['platform']} {alert['field']} selector `{alert['selector']}` hit rate dropped to {alert['hit_rate']:.0%} (since {alert['since']}). Falling back to learned selectors and structural heuristics.")
+    selector_rows = selector_stats.summary()
+    if selector_rows:
+        st.dataframe(selector_rows, use_container_width=True)
+    else:
+        st.info("No selector statistics recorded yet.")
+
+    st.markdown("#### 🔁 Retry Queue")
+    entries = list_entries()
+    if entries:
+        st.dataframe([{
+            "url": url,
+            "failure": entry["kind"],
+            "attempts": entry["attempts"],
+            "message": entry["message"],
+            "next retry": "parked" if entry["parked"] else datetime.fromtimestamp(entry["next_attempt"]).strftime('%Y-%m-%d %H:%M:%S'),
+        } for url, entry in entries.items()], use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("🔁 Run Due Retries", use_container_width=True):
+                results, refreshed = retry_failed(st.session_state.tracked_products)
+                st.success(f"Retried {len(results)} untracked URLs, added {refreshed} products. "
+                           f"Tracked products are retried by the refresh workers.")
+        with col2:
+            if st.button("♻️ Unpark Layout Failures", use_container_width=True):
+                count = unpark("selector_miss") + unpark("parse_error")
+                st.success(f"{count} URLs queued for retry.")
+    else:
+        st.info("No failed scrapes are waiting to be retried.")
@@ -0,0 +1,192 @@
+import argparse
+import os
+import socket
+import sqlite3
+import sys
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from product_store import DATA_FILE, load_tracked_products
+from retry_queue import get_entry
+from workers import FETCH_THREADS, PARSE_PROCESSES, make_parse_pool, refresh_products
+
+# Shared SQLite file holding crawl work items; every worker container mounts the same file
+WORK_QUEUE_DB = os.environ.get("WORK_QUEUE_DB", "work_queue.db")
+
+# How often each tracked product is refreshed
+REFRESH_INTERVAL_SECONDS = int(os.environ.get("REFRESH_INTERVAL_SECONDS", 3600))
+
+# A claimed item becomes visible to other workers again if not completed within the lease
+LEASE_SECONDS = int(os.environ.get("LEASE_SECONDS", 300))
+
+# Items claimed per worker round and seconds to sleep when nothing is due
+CLAIM_BATCH_SIZE = int(os.environ.get("CLAIM_BATCH_SIZE", 20))
+POLL_SECONDS = int(os.environ.get("POLL_SECONDS", 30))
+
+# Minimum seconds between re-reading the store for added and removed products
+SYNC_INTERVAL_SECONDS = int(os.environ.get("SYNC_INTERVAL_SECONDS", 60))
+
+
+##############################
+# DATABASE
+##############################
+def init_work_queue(db_path=WORK_QUEUE_DB):
+    # Autocommit connection; claims use explicit BEGIN IMMEDIATE transactions
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute('''CREATE TABLE IF NOT EXISTS work_items (
+        url TEXT PRIMARY KEY,
+        due_at REAL NOT NULL,
+        lease_owner TEXT,
+        lease_expires REAL,
+        attempts INTEGER NOT NULL DEFAULT 0)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_work_items_due ON work_items (due_at)")
+    return conn
+
+
+def enqueue(conn, urls, due_at=None):
+    # Add URLs that are not queued yet; existing items keep their schedule
+    due_at = due_at or time.time()
+    cursor = conn.executemany("INSERT OR IGNORE INTO work_items (url, due_at) VALUES (?, ?)",
+                              [(url, due_at) for url in urls])
+    return cursor.rowcount
+
+
+def sync_from_store(conn, path=DATA_FILE):
+    # Queue every tracked product and drop items that are no longer tracked
+    urls = list(load_tracked_products(path))
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        added = enqueue(conn, urls)
+        if urls:
+            # Through a temp table: a NOT IN (?, ...) list hits SQLite's bound-parameter limit on large catalogs
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS tracked_urls (url TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM tracked_urls")
+            conn.executemany("INSERT OR IGNORE INTO tracked_urls (url) VALUES (?)", [(url,) for url in urls])
+            conn.execute("DELETE FROM work_items WHERE url NOT IN (SELECT url FROM tracked_urls)")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return added
+
+
+def _store_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def claim(conn, worker_id, limit=CLAIM_BATCH_SIZE, lease_seconds=LEASE_SECONDS, now=None):
+    # Atomically lease up to `limit` due items that no other worker holds a live lease on
+    now = now or time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        urls = [row[0] for row in conn.execute(
+            "SELECT url FROM work_items WHERE due_at <= ? AND (lease_expires IS NULL OR lease_expires < ?) "
+            "ORDER BY due_at LIMIT ?", (now, now, limit))]
+        conn.executemany("UPDATE work_items SET lease_owner = ?, lease_expires = ? WHERE url = ?",
+                         [(worker_id, now + lease_seconds, url) for url in urls])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return urls
+
+
+def complete(conn, worker_id, url, next_due=None):
+    # Reschedule a finished item; ignored if the lease expired and another worker took it over
+    next_due = next_due or time.time() + REFRESH_INTERVAL_SECONDS
+    cursor = conn.execute(
+        "UPDATE work_items SET due_at = ?, lease_owner = NULL, lease_expires = NULL, attempts = 0 "
+        "WHERE url = ? AND lease_owner = ?", (next_due, url, worker_id))
+    return cursor.rowcount == 1
+
+
+def fail(conn, worker_id, url, retry_at):
+    cursor = conn.execute(
+        "UPDATE work_items SET due_at = ?, lease_owner = NULL, lease_expires = NULL, attempts = attempts + 1 "
+        "WHERE url = ? AND lease_owner = ?", (retry_at, url, worker_id))
+    return cursor.rowcount == 1
+
+
+def queue_stats(conn, now=None):
+    now = now or time.time()
+    row = conn.execute(
+        "SELECT COUNT(*), "
+        "SUM(CASE WHEN due_at <= ? AND (lease_expires IS NULL OR lease_expires < ?) THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN lease_expires >= ? THEN 1 ELSE 0 END) FROM work_items", (now, now, now)).fetchone()
+    return {"total": row[0], "due": row[1] or 0, "leased": row[2] or 0}
+
+
+##############################
+# WORKER
+##############################
+def _retry_at(url, now):
+    # Follow the retry queue's per-class backoff; parked URLs wait a full refresh interval
+    entry = get_entry(url)
+    if entry and not entry["parked"] and entry["next_attempt"]:
+        return entry["next_attempt"]
+    return now + REFRESH_INTERVAL_SECONDS
+
+
+def run_once(conn, worker_id, path=DATA_FILE, limit=CLAIM_BATCH_SIZE,
+             fetch_threads=FETCH_THREADS, parse_processes=PARSE_PROCESSES, parse_pool=None):
+    urls = claim(conn, worker_id, limit)
+    if not urls:
+        return None
+    summary = refresh_products(urls, fetch_threads, parse_processes, path=path, parse_pool=parse_pool)
+    now = time.time()
+    for url in urls:
+        if summary["results"].get(url) == "ok":
+            complete(conn, worker_id, url)
+        else:
+            fail(conn, worker_id, url, _retry_at(url, now))
+    return summary
+
+
+def run_worker(worker_id=None, db_path=WORK_QUEUE_DB, path=DATA_FILE, limit=CLAIM_BATCH_SIZE,
+               poll_seconds=POLL_SECONDS, fetch_threads=FETCH_THREADS, parse_processes=PARSE_PROCESSES):
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    conn = init_work_queue(db_path)
+    # One parse pool for the worker's lifetime instead of one per claimed batch
+    parse_pool = make_parse_pool(parse_processes)
+    print(f"Worker {worker_id} started", file=sys.stderr)
+    synced_mtime, synced_at = None, 0.0
+    while True:
+        try:
+            # Re-reading the store is O(catalog), and this worker's own writes touch it after every
+            # batch, so sync only when it changed and at most once per SYNC_INTERVAL_SECONDS
+            mtime = _store_mtime(path)
+            if mtime != synced_mtime and time.time() - synced_at >= SYNC_INTERVAL_SECONDS:
+                sync_from_store(conn, path)
+                synced_mtime, synced_at = mtime, time.time()
+            summary = run_once(conn, worker_id, path, limit, fetch_threads, parse_processes, parse_pool)
+        except BrokenProcessPool as e:
+            # A parse process died; claimed items come back when their leases expire
+            print("Worker Error: parse pool broken, restarting it:", e, file=sys.stderr)
+            parse_pool.shutdown(wait=False)
+            parse_pool = make_parse_pool(parse_processes)
+            summary = None
+        except Exception as e:
+            print("Worker Error:", e, file=sys.stderr)
+            summary = None
+        if summary:
+            print(f"Worker {worker_id}: refreshed {summary['refreshed']}/{summary['total']} "
+                  f"in {summary['elapsed']}s ({summary['failed']} failed)", file=sys.stderr)
+        else:
+            time.sleep(poll_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh tracked products from the shared work queue")
+    parser.add_argument("--worker-id", help="defaults to hostname-pid")
+    parser.add_argument("--db", default=WORK_QUEUE_DB, help="shared work queue SQLite file")
+    parser.add_argument("--data-file", default=DATA_FILE, help="tracked products JSON file")
+    parser.add_argument("--batch", type=int, default=CLAIM_BATCH_SIZE, help="items claimed per round")
+    parser.add_argument("--threads", type=int, default=FETCH_THREADS, help="concurrent downloads")
+    parser.add_argument("--processes", type=int, default=PARSE_PROCESSES, help="HTML parsing processes")
+    args = parser.parse_args()
+    run_worker(args.worker_id, args.db, args.data_file, args.batch,
+               fetch_threads=args.threads, parse_processes=args.processes)
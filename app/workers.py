@@ -0,0 +1,201 @@
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from datetime import datetime
+
+import selector_stats
+from fetch_strategy import (clear_escalation, escalation_reason, fetch_with_browser, mark_needs_browser,
+                            should_escalate)
+from metrics import inc, timer, drain as drain_metrics, merge as merge_metrics
+from product_store import DATA_FILE, get_buffer, load_tracked_products
+from retry_queue import record_failure, record_success
+from scraper import ScrapeError, detect_platform, download_page, parse_product
+
+# Concurrent HTTP downloads (I/O bound)
+FETCH_THREADS = int(os.environ.get("FETCH_THREADS", 8))
+
+# HTML parsing processes (CPU bound); defaults to one per core
+PARSE_PROCESSES = int(os.environ.get("PARSE_PROCESSES", os.cpu_count() or 1))
+
+# Parse processes are spawned rather than forked: the web app runs metrics, event, deals, flusher
+# and retention threads, and a forked child can inherit one of their locks held and hang
+PARSE_CONTEXT = multiprocessing.get_context("spawn")
+
+# Number of refreshed products written to the store per save
+WRITE_BATCH_SIZE = int(os.environ.get("WRITE_BATCH_SIZE", 50))
+
+
+def _init_parse_worker():
+    # Only the parent process persists learned selector stats, so workers don't race on the file;
+    # outcomes are captured instead and sent back with each result
+    selector_stats.SAVE_INTERVAL_SECONDS = float("inf")
+    selector_stats.start_capture()
+
+
+def make_parse_pool(processes=PARSE_PROCESSES):
+    # Long-running callers (work_queue.py) create this once and pass it to every refresh_products
+    # call, since starting spawned processes and importing the parser costs about a second
+    return ProcessPoolExecutor(max_workers=processes, initializer=_init_parse_worker, mp_context=PARSE_CONTEXT)
+
+
+def _parse_in_worker(content, platform):
+    # Runs in a parse process. Returns (result, error, selector outcomes, metrics) so the parent
+    # can feed selector learning, drift detection and /metrics with what happened here.
+    try:
+        result, error = parse_product(content, platform), None
+    except ScrapeError as e:
+        result, error = None, e
+    except Exception as e:
+        result, error = None, ScrapeError("parse_error", str(e), platform)
+    return result, error, selector_stats.drain_capture(), drain_metrics()
+
+
+def _download(url):
+    platform = detect_platform(url)
+    content, fields = download_page(url, platform)
+    return platform, content, fields
+
+
+def _browse(url, reason):
+    # Browser tier for URLs whose plain page is bot-walled or needs JavaScript. Driver errors keep
+    # the failure class that escalated the URL so the retry queue backs off the same way.
+    platform = detect_platform(url)
+    try:
+        product = fetch_with_browser(url)
+    except Exception as e:
+        if not isinstance(e, ScrapeError):
+            e = ScrapeError(reason, f"Browser fetch failed: {e}", platform)
+        inc("fetch_tier_total", tier="browser", result=e.kind)
+        clear_escalation(url)
+        raise e
+    inc("fetch_tier_total", tier="browser", result="ok")
+    return product["title"], product["price"], platform
+
+
+class BatchedWriter:
+    # Single writer that queues refreshed prices on the store's write-behind buffer and writes
+    # them once per batch. The buffer applies them to the latest file contents under the store
+    # lock, so updates from other writers since the last flush are kept.
+    def __init__(self, path=DATA_FILE, batch_size=WRITE_BATCH_SIZE):
+        self.buffer = get_buffer(path)
+        self.batch_size = batch_size
+        self.pending = 0
+
+    def add(self, url, name, price, platform, timestamp):
+        self.buffer.add(url, name, price, platform, timestamp)
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        with timer("batched_write"):
+            self.buffer.flush()
+        inc("batched_writes_total")
+        self.pending = 0
+
+
+def refresh_products(urls=None, fetch_threads=FETCH_THREADS, parse_processes=PARSE_PROCESSES,
+                     batch_size=WRITE_BATCH_SIZE, path=DATA_FILE, progress=None, parse_pool=None):
+    # Refresh tracked products: downloads run on a thread pool, HTML parsing on a process pool,
+    # and all results go through one batched writer. URLs escalated to the browser tier are
+    # fetched with the browser pool (on the download threads) instead, and plain pages that turn
+    # out bot-walled or unparseable are escalated. `progress(url, result)` is called as each
+    # URL finishes. A `parse_pool` from make_parse_pool() is used instead of starting one for
+    # this call. Returns a summary of the run.
+    writer = BatchedWriter(path, batch_size)
+    urls = [url for url in (urls or list(load_tracked_products(path))) if detect_platform(url) != "Unknown"]
+    summary = {"total": len(urls), "refreshed": 0, "failed": 0, "failures": {}, "results": {}}
+    start = time.perf_counter()
+
+    def handle(url, result=None, error=None):
+        if error is not None:
+            kind = getattr(error, "kind", "parse_error")
+            record_failure(url, error)
+            summary["failed"] += 1
+            summary["failures"][kind] = summary["failures"].get(kind, 0) + 1
+            summary["results"][url] = kind
+            if progress:
+                progress(url, kind)
+            return
+        name, price, platform = result
+        record_success(url)
+        writer.add(url, name, price, platform, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        summary["refreshed"] += 1
+        summary["results"][url] = "ok"
+        if progress:
+            progress(url, "ok")
+
+    with ThreadPoolExecutor(max_workers=fetch_threads) as fetch_pool, \
+            (nullcontext(parse_pool) if parse_pool else make_parse_pool(parse_processes)) as parse_pool:
+        downloads, browsed, parses = {}, {}, {}
+        for url in urls:
+            reason = escalation_reason(url)
+            if reason is None:
+                downloads[fetch_pool.submit(_download, url)] = url
+            else:
+                browsed[fetch_pool.submit(_browse, url, reason)] = url
+
+        def escalate(url, error):
+            mark_needs_browser(url, error.kind)
+            browsed[fetch_pool.submit(_browse, url, error.kind)] = url
+
+        for future in as_completed(downloads):
+            url = downloads[future]
+            try:
+                platform, content, fields = future.result()
+            except ScrapeError as e:
+                if should_escalate(url, e):
+                    escalate(url, e)
+                else:
+                    handle(url, error=e)
+                continue
+            if fields:
+                inc("extraction_path_total", platform=platform, path="stream")
+                handle(url, result=(fields[0], fields[1], platform))
+            else:
+                parses[parse_pool.submit(_parse_in_worker, content, platform)] = url
+
+        for future in as_completed(parses):
+            url = parses[future]
+            try:
+                result, error, outcomes, observed = future.result()
+            except Exception as e:
+                handle(url, error=ScrapeError("parse_error", str(e), detect_platform(url)))
+                continue
+            selector_stats.replay(outcomes)
+            merge_metrics(observed)
+            if error is not None and should_escalate(url, error):
+                escalate(url, error)
+            else:
+                handle(url, result=result, error=error)
+
+        # Every escalation has been submitted by now
+        for future in as_completed(list(browsed)):
+            url = browsed[future]
+            try:
+                handle(url, result=future.result())
+            except ScrapeError as e:
+                handle(url, error=e)
+
+    writer.flush()
+    summary["elapsed"] = round(time.perf_counter() - start, 2)
+    summary["per_second"] = round(len(urls) / summary["elapsed"], 2) if summary["elapsed"] else None
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh all tracked products")
+    parser.add_argument("--threads", type=int, default=FETCH_THREADS, help="concurrent downloads")
+    parser.add_argument("--processes", type=int, default=PARSE_PROCESSES, help="HTML parsing processes")
+    parser.add_argument("--batch-size", type=int, default=WRITE_BATCH_SIZE, help="products written per save")
+    parser.add_argument("--data-file", default=DATA_FILE, help="tracked products JSON file")
+    args = parser.parse_args()
+    summary = refresh_products(fetch_threads=args.threads, parse_processes=args.processes,
+                               batch_size=args.batch_size, path=args.data_file)
+    summary.pop("results")
+    print(summary)